@@ -1,38 +1,73 @@
 import numpy as np
-from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
-def bow_for_comparing(texts):
+import tracing
+
+# scikit-learn is imported inside each function: it takes over a second to import
+# and callers that only import this module should not pay for it
+
+@tracing.traced('algorithms.bow_for_comparing')
+def bow_for_comparing(texts, corpus_model=None):
     #######################
     # Converts a list of texts to a Bag of Words model
-    vectorizer = CountVectorizer()
-    bow_matrix = vectorizer.fit_transform(texts)
+    if corpus_model is not None:
+        # A frozen corpus_vectorizer.CorpusVectorizer only transforms, keeping scores stable between runs
+        bow_matrix = corpus_model.transform(texts)
+    else:
+        from sklearn.feature_extraction.text import CountVectorizer
+        vectorizer = CountVectorizer()
+        bow_matrix = vectorizer.fit_transform(texts)
+    tracing.count('documents', bow_matrix.shape[0])
+    tracing.count('features', bow_matrix.shape[1])
     return bow_matrix
 
 def calculate_cosine_similarity(bow_matrix):
     """Calculates and returns the cosine similarity matrix from a BoW matrix."""
+    from sklearn.metrics.pairwise import cosine_similarity
     similarity_matrix = cosine_similarity(bow_matrix)
     return similarity_matrix
 
-def create_bow_from_text(texts):
+@tracing.traced('algorithms.similarity_to_first')
+def similarity_to_first(bow_matrix):
+    """
+    Cosine similarity of the first row (the main document) against every row.
+
+    Only one row of the all-pairs matrix was ever read, so this scores one-vs-many
+    on the sparse rows directly; entry 0 is the main document against itself.
+    """
+    from sklearn.preprocessing import normalize
+    rows = normalize(bow_matrix.astype(np.float32))
+    return (rows @ rows[0].T).toarray().ravel()
+
+@tracing.traced('algorithms.create_bow_from_text')
+def create_bow_from_text(texts, corpus_model=None):
     """Generate Bag of Words model from text, including bi-grams."""
-    # Initialize TfidfVectorizer to include uni-grams and bi-grams
-    vectorizer = TfidfVectorizer(ngram_range=(1, 2), stop_words='english')
+    from sklearn.feature_extraction.text import TfidfVectorizer
     # Ensure that each element in texts is a string
     if any(isinstance(text, list) for text in texts):
         # Join each list of strings into a single string if necessary
         texts = [' '.join(text) if isinstance(text, list) else text for text in texts]
-    # Transform text into TF-IDF matrix
-    X = vectorizer.fit_transform([texts])
+    if corpus_model is not None:
+        # Reuse the library-wide vocabulary and IDF instead of fitting on this text alone
+        vectorizer = corpus_model.vectorizer
+        X = vectorizer.transform([texts])
+        feature_names = corpus_model.feature_names()
+    else:
+        # Initialize TfidfVectorizer to include uni-grams and bi-grams
+        vectorizer = TfidfVectorizer(ngram_range=(1, 2), stop_words='english')
+        # Transform text into TF-IDF matrix
+        X = vectorizer.fit_transform([texts])
 
-    # Extract feature names (words and bi-grams)
-    feature_names = vectorizer.get_feature_names_out()
+        # Extract feature names (words and bi-grams)
+        feature_names = vectorizer.get_feature_names_out()
 
+    tracing.count('features', X.shape[1])
     # Sum tf-idf scores for each feature to find the most frequent terms
     summed_tfidf = X.sum(axis=0).A1
 
-    # Sort features by summed TF-IDF scores
-    sorted_indices = np.argsort(summed_tfidf)[::-1]  # Sort descending
+    # Sort features present in the text by summed TF-IDF scores; a corpus model's vocabulary
+    # also holds terms from other books, which score zero here
+    present = np.flatnonzero(summed_tfidf)
+    sorted_indices = present[np.argsort(summed_tfidf[present])[::-1]]  # Sort descending
 
     # Prioritize bi-grams by boosting their index sort value if they contain a space (indicative of a bi-gram)
     bi_gram_boosted_indices = sorted(sorted_indices, key=lambda idx: (' ' in feature_names[idx], summed_tfidf[idx]), reverse=True)
@@ -43,4 +78,35 @@ def create_bow_from_text(texts):
     # Print top features for verification
     print("Top Features (uni-grams or bi-grams) based on summed TF-IDF scores:", top_features)
     
-    return vectorizer, X, top_features
\ No newline at end of file
+    return vectorizer, X, top_features
+
+@tracing.traced('algorithms.create_bow_from_stream')
+def create_bow_from_stream(pages, top_n=10, capacity=None):
+    """
+    Streaming version of create_bow_from_text for texts too large to vectorize at once.
+
+    Pages (or whole preprocessed documents) are counted one at a time in a bounded-memory
+    n-gram sketch instead of being concatenated and fitted. Top features follow the same
+    rule: bi-grams first, then by TF-IDF score, which on a single document ranks like the
+    raw count. Returns (vectorizer, X, top_features) like create_bow_from_text, with the
+    vectorizer and X restricted to the n-grams the sketch kept.
+    """
+    from scipy import sparse
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from ngram_stream import DEFAULT_CAPACITY, count_ngrams
+
+    sketch = count_ngrams(pages, capacity or DEFAULT_CAPACITY)
+    tracing.count('ngrams', sketch.total)
+    tracing.count('features', len(sketch.counts))
+    terms = sorted(sketch.counts)
+    # One document, so every IDF is 1 and the TF-IDF row is the L2-normalised count row
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2), stop_words='english', vocabulary=terms)
+    vectorizer.idf_ = np.ones(len(terms))
+    counts = np.array([sketch.counts[term] for term in terms], dtype=np.float64)
+    norm = np.linalg.norm(counts)
+    X = sparse.csr_matrix((counts / norm if norm else counts).reshape(1, -1))
+
+    # Partial selection of the top n instead of sorting every n-gram
+    top_features = [term for term, _ in sketch.top(top_n, key=lambda item: (' ' in item[0], item[1]))]
+    print("Top Features (uni-grams or bi-grams) based on summed TF-IDF scores:", top_features)
+    return vectorizer, X, top_features
@@ -1,5 +1,24 @@
 import fitz  # PyMuPDF
+import json
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from pdf_extractor import iter_page_text
+
+# Metadata and first-page text per PDF, cached as <dir>/<content hash>-<pages>.json
+CITATION_CACHE_DIR = os.environ.get('SYLLAGENIUS_CITATION_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'syllagenius', 'citations'))
+CITATION_PAGES = 5
+
+# Common patterns or lines that might indicate publisher information
+PUBLISHER_PATTERNS = [
+    re.compile(r"Published by (?P<publisher>[\w\s,]+)", re.IGNORECASE),
+    re.compile(r"Publisher: (?P<publisher>[\w\s,]+)", re.IGNORECASE),
+]
+# Split authors by common separators (e.g., ",", "and")
+AUTHOR_SEPARATOR = re.compile(',|and')
+# Titles or credentials (e.g., "PhD")
+CREDENTIALS = re.compile(r'PhD|Dr\.?')
+YEAR_PATTERN = re.compile(r'D:(\d{4})')
 
 def extract_pdf_metadata(pdf_path):
     with fitz.open(pdf_path) as doc:
@@ -17,12 +36,7 @@ def extract_text_from_first_pages(pdf_path, num_pages=3):
     Returns:
     str: Concatenated text from the specified number of pages.
     """
-    text = ""
-    with fitz.open(pdf_path) as doc:
-        for page_num in range(min(num_pages, len(doc))):
-            page = doc.load_page(page_num)
-            text += page.get_text()
-    return text
+    return "".join(iter_page_text(pdf_path, 0, num_pages))
 
 def find_publisher_in_text(text):
     """
@@ -34,14 +48,8 @@ def find_publisher_in_text(text):
     Returns:
     str: Publisher name if found, otherwise "Unknown Publisher".
     """
-    # Common patterns or lines that might indicate publisher information
-    patterns = [
-        r"Published by (?P<publisher>[\w\s,]+)",
-        r"Publisher: (?P<publisher>[\w\s,]+)"
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
+    for pattern in PUBLISHER_PATTERNS:
+        match = pattern.search(text)
         if match:
             return match.group("publisher").strip()
     
@@ -57,13 +65,12 @@ def parse_authors(authors_str):
     Returns:
     str: Formatted author names in "Last, F. M." format, joined by "&" for APA citation.
     """
-    # Split authors by common separators (e.g., ",", "and")
-    authors = re.split(',|and', authors_str)
+    authors = AUTHOR_SEPARATOR.split(authors_str)
     formatted_authors = []
     
     for author in authors:
         # Remove titles or credentials (e.g., "PhD")
-        author = re.sub(r'PhD|Dr\.?', '', author).strip()
+        author = CREDENTIALS.sub('', author).strip()
         # Split name into parts
         name_parts = author.split()
         # Format name parts: Last, F. M.
@@ -78,7 +85,12 @@ def parse_authors(authors_str):
     # Join formatted author names with "&"
     return ' & '.join(formatted_authors)
 
-def format_apa_reference(metadata):
+def format_apa_reference(metadata, text=None, pdf_path=None):
+    """
+    Formats an APA reference from PDF metadata and the text of the book's first pages.
+
+    text is searched for the publisher; when it is not given it is read from pdf_path.
+    """
     author_str = metadata.get('author', 'Unknown Author')
     # Call parse_authors to format author names
     authors_formatted = parse_authors(author_str)
@@ -87,18 +99,91 @@ def format_apa_reference(metadata):
     year = metadata.get('creationDate', 'Unknown Year')
     
     # Attempt to extract the year
-    year_match = re.search(r'D:(\d{4})', year)
+    year_match = YEAR_PATTERN.search(year)
     year = year_match.group(1) if year_match else "Unknown Year"
     
     # Assuming the publisher is not available in PDF metadata
-    text = extract_text_from_first_pages(pdf_path, num_pages=5)
+    if text is None:
+        text = extract_text_from_first_pages(pdf_path, num_pages=CITATION_PAGES)
     publisher = find_publisher_in_text(text)
     
     apa_reference = f"{authors_formatted} ({year}). {title}. {publisher}."
     return apa_reference
 
-# Example usage
-pdf_path = 'Biology for Dummies.pdf'
-metadata = extract_pdf_metadata(pdf_path)
-apa_reference = format_apa_reference(metadata)
-print(apa_reference)
+def read_citation_source(pdf_path, num_pages=CITATION_PAGES, cache_dir=None):
+    """
+    Returns (content hash, metadata, first-pages text) for pdf_path, opening it at most once.
+
+    Results are cached by content hash, so a book cited again, under any path, is not reopened.
+    """
+    from page_cache import file_digest
+    digest = file_digest(pdf_path)
+    cache_dir = cache_dir or CITATION_CACHE_DIR
+    cache_path = os.path.join(cache_dir, f"{digest}-{num_pages}.json")
+    if os.path.exists(cache_path):
+        with open(cache_path, encoding='utf-8') as f:
+            cached = json.load(f)
+        return digest, cached['metadata'], cached['text']
+    with fitz.open(pdf_path) as doc:
+        metadata = doc.metadata
+        text = "".join(doc.load_page(page_num).get_text() for page_num in range(min(num_pages, len(doc))))
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'metadata': metadata, 'text': text}, f)
+    os.replace(tmp_path, cache_path)
+    return digest, metadata, text
+
+def cite(pdf_path, num_pages=CITATION_PAGES, cache_dir=None):
+    """Citation record for one PDF: path, content hash and APA reference, or the error that stopped it."""
+    try:
+        digest, metadata, text = read_citation_source(pdf_path, num_pages, cache_dir)
+    except Exception as e:  # one unreadable PDF should not stop a whole reading list
+        return {'path': pdf_path, 'key': None, 'citation': None, 'error': f"{type(e).__name__}: {e}"}
+    return {'path': pdf_path, 'key': digest, 'citation': format_apa_reference(metadata, text), 'error': None}
+
+def _cite_with_options(args):
+    return cite(*args)
+
+def cite_many(pdf_paths, workers=None, num_pages=CITATION_PAGES, cache_dir=None):
+    """Yields a citation record per PDF, in input order, using a process pool when workers is set."""
+    tasks = [(pdf_path, num_pages, cache_dir) for pdf_path in pdf_paths]
+    if workers and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(_cite_with_options, tasks, chunksize=4)
+    else:
+        yield from map(_cite_with_options, tasks)
+
+def collect_pdf_paths(source):
+    """
+    PDF paths from a directory (searched recursively) or a manifest file.
+
+    A manifest lists one path per line; blank lines and lines starting with # are
+    skipped, and relative paths are taken relative to the manifest.
+    """
+    if os.path.isdir(source):
+        import glob
+        return sorted(glob.glob(os.path.join(source, '**', '*.pdf'), recursive=True))
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding='utf-8') as f:
+        lines = [line.strip() for line in f]
+    return [os.path.join(base, line) for line in lines if line and not line.startswith('#')]
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Write an APA citation for every PDF in a directory or manifest as JSON lines.")
+    parser.add_argument('source', help="Directory of PDFs, or a manifest file with one PDF path per line")
+    parser.add_argument('-o', '--output', help="JSONL file to write (default: standard output)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--pages', type=int, default=CITATION_PAGES, help="Pages searched for the publisher")
+    args = parser.parse_args()
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for record in cite_many(collect_pdf_paths(args.source), args.workers, args.pages):
+            output.write(json.dumps(record) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
@@ -0,0 +1,166 @@
+"""
+Generates every course in a manifest without prompts and writes one JSON record per course.
+
+The manifest is JSON lines, one course per line:
+
+    {"id": "DA101", "title": "Data analytics", "main": "books/analytics.pdf", "supporting": ["books/algorithms.pdf"]}
+
+id is optional (the line number is used instead) and relative paths are taken relative
+to the manifest. Courses run concurrently in a bounded process pool and each record is
+written as soon as its course finishes, so an interrupted run can be resumed.
+
+With --paraphrase-workers N (or SYLLAGENIUS_PARAPHRASE_WORKERS) the paraphrase model is
+loaded once in a pool of N workers and every course's description is paraphrased there,
+instead of each course process loading and running its own copy.
+
+    python batch_runner.py catalogue.jsonl -o courses.jsonl --workers 4 --below-threshold skip
+"""
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import print_output
+from main import run_course
+
+
+def read_manifest(manifest_path):
+    """Returns the manifest's courses as dicts with id, title, main and supporting (absolute paths)."""
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    courses = []
+    with open(manifest_path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            course = json.loads(line)
+            courses.append({
+                'id': str(course.get('id', line_number)),
+                'title': course['title'],
+                'main': os.path.join(base, course['main']),
+                'supporting': [os.path.join(base, path) for path in course.get('supporting') or []],
+            })
+    return courses
+
+
+def completed_ids(output_path):
+    """
+    Ids of the courses already written to output_path by an earlier run.
+
+    A course whose latest record is an error is not counted, so resuming retries it.
+    """
+    if not os.path.exists(output_path):
+        return set()
+    statuses = {}
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                statuses[record['id']] = record.get('status')
+            except (ValueError, KeyError, TypeError):
+                continue  # a line cut short when the earlier run was interrupted
+    return {course_id for course_id, status in statuses.items() if status != 'error'}
+
+
+def run_one(course, threshold=50.0, below_threshold='skip', corpus_model_path=None, paraphrase=True):
+    """Runs one course and returns its record; failures become a record with status 'error'."""
+    start = time.perf_counter()
+    try:
+        record = run_course(course['title'], course['main'], course['supporting'], threshold=threshold,
+                            below_threshold=below_threshold, corpus_model_path=corpus_model_path, paraphrase=paraphrase)
+        record['error'] = None
+    except Exception as e:  # one broken book should not stop the catalogue
+        record = {'title': course['title'], 'main': course['main'], 'supporting': course['supporting'],
+                  'status': 'error', 'error': f"{type(e).__name__}: {e}", 'traceback': traceback.format_exc()}
+    record['id'] = course['id']
+    record['seconds'] = time.perf_counter() - start
+    return record
+
+
+def _paraphrase_records(records):
+    # Descriptions of every course that finished together are paraphrased as one call to the pool
+    described = [record for record in records if record.get('generated_description')]
+    start = time.perf_counter()
+    try:
+        paraphrased = print_output.paraphrase_descriptions([record['generated_description'] for record in described])
+    except Exception as e:
+        for record in described:
+            record.update(status='error', error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+        return
+    seconds = (time.perf_counter() - start) / max(len(described), 1)
+    for record, description in zip(described, paraphrased):
+        record['description'] = description
+        record['seconds'] += seconds
+
+
+def run_catalogue(manifest_path, output_path, workers=2, threshold=50.0, below_threshold='skip',
+                  corpus_model_path=None, resume=True, paraphrase_workers=None):
+    """
+    Runs every course in the manifest and appends its record to output_path as it finishes.
+
+    At most workers courses run at once, and no more than twice that many are queued, so
+    memory stays bounded however long the manifest is. With resume, courses already in
+    output_path are not run again. With paraphrase_workers > 1 descriptions are paraphrased
+    in this process by a shared print_output.ParaphrasePool. Returns a count of records per status.
+    """
+    courses = read_manifest(manifest_path)
+    if resume:
+        done = completed_ids(output_path)
+        courses = [course for course in courses if course['id'] not in done]
+    paraphrase_workers = print_output.PARAPHRASE_WORKERS if paraphrase_workers is None else paraphrase_workers
+    shared = paraphrase_workers > 1
+    mp_context = None
+    if shared:
+        # The pool forks before anything else runs here; course workers then start from a
+        # clean server process rather than from this one, which now has the pool's threads
+        print_output.start_paraphrase_pool(paraphrase_workers)
+        mp_context = multiprocessing.get_context('forkserver')
+    statuses = {}
+    pending = set()
+    queue = iter(courses)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor, \
+                open(output_path, 'a' if resume else 'w', encoding='utf-8') as output:
+            while True:
+                for course in queue:
+                    pending.add(executor.submit(run_one, course, threshold, below_threshold, corpus_model_path, not shared))
+                    if len(pending) >= 2 * workers:
+                        break
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                records = [future.result() for future in finished]
+                if shared:
+                    _paraphrase_records(records)
+                for record in records:
+                    output.write(json.dumps(record) + "\n")
+                    output.flush()
+                    statuses[record['status']] = statuses.get(record['status'], 0) + 1
+                    print(f"{record['id']}: {record['status']} ({record['seconds']:.1f}s)")
+    finally:
+        if shared:
+            print_output.stop_paraphrase_pools()
+    return statuses
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('manifest', help="JSON lines file with one course per line")
+    parser.add_argument('-o', '--output', default='courses.jsonl')
+    parser.add_argument('--workers', type=int, default=2, help="Courses generated at the same time")
+    parser.add_argument('--threshold', type=float, default=50.0, help="Minimum similarity percentage of a supporting book")
+    parser.add_argument('--below-threshold', choices=['skip', 'continue'], default='skip',
+                        help="Whether courses with a dissimilar supporting book are skipped or generated anyway")
+    parser.add_argument('--corpus-model', help="Saved corpus_vectorizer model to score against")
+    parser.add_argument('--paraphrase-workers', type=int,
+                        help="Processes sharing one loaded paraphrase model (default: SYLLAGENIUS_PARAPHRASE_WORKERS)")
+    parser.add_argument('--no-resume', action='store_true', help="Overwrite the output instead of skipping finished courses")
+    args = parser.parse_args()
+
+    statuses = run_catalogue(args.manifest, args.output, args.workers, args.threshold, args.below_threshold,
+                             args.corpus_model, resume=not args.no_resume, paraphrase_workers=args.paraphrase_workers)
+    print(", ".join(f"{count} {status}" for status, count in sorted(statuses.items())) or "Nothing to do")
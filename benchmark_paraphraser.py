@@ -0,0 +1,115 @@
+"""
+Compares paraphrase backends on a fixed sentence set.
+
+Each backend runs in its own subprocess so peak RSS is measured per backend. Latency,
+peak RSS and the similarity of each backend's output to the fp32 pipeline are reported.
+
+    python benchmark_paraphraser.py --backends fp32 int8 onnx --json results.json
+"""
+import argparse
+import difflib
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from education_data import adjectives, nouns, verbs, templates
+
+
+def benchmark_sentences(count=40, seed=0):
+    """Builds a reproducible sentence set from the description templates."""
+    rng = random.Random(seed)
+    topics = ['data analytics', 'machine learning', 'cell biology', 'linear regression', 'neural networks']
+    sentences = []
+    while len(sentences) < count:
+        template = templates[len(sentences) % len(templates)]
+        sentences.append(template.format(
+            title=rng.choice(topics).title(),
+            adjective=rng.choice(adjectives),
+            noun=rng.choice(nouns),
+            verb=rng.choice(verbs),
+            topic=rng.choice(topics),
+        ))
+    return sentences
+
+
+def run_backend(backend, sentences, batch_size):
+    """Times one backend in this process and returns its measurements."""
+    import print_output
+
+    start = time.perf_counter()
+    print_output.get_paraphraser(backend)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    outputs = print_output.paraphrase_sentences(sentences, batch_size=batch_size, use_cache=False, backend=backend)
+    run_seconds = time.perf_counter() - start
+
+    return {
+        'backend': backend,
+        'load_seconds': load_seconds,
+        'run_seconds': run_seconds,
+        'ms_per_sentence': 1000 * run_seconds / len(sentences),
+        # ru_maxrss is reported in kilobytes on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'outputs': outputs,
+    }
+
+
+def similarity(outputs, reference):
+    """Mean word-level similarity ratio and exact-match rate against the reference outputs."""
+    ratios = [difflib.SequenceMatcher(None, a.split(), b.split()).ratio() for a, b in zip(outputs, reference)]
+    exact = sum(a == b for a, b in zip(outputs, reference))
+    return sum(ratios) / len(ratios), exact / len(reference)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--backends', nargs='+', default=['fp32', 'int8'])
+    parser.add_argument('--sentences', type=int, default=40)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--json', help='Write the full results, including outputs, to this file')
+    parser.add_argument('--worker', nargs=2, metavar=('BACKEND', 'OUTPUT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sentences = benchmark_sentences(args.sentences)
+    if args.worker:
+        backend, output_path = args.worker
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(run_backend(backend, sentences, args.batch_size), f)
+        return
+
+    results = []
+    for backend in dict.fromkeys(['fp32'] + args.backends):
+        # Results go through a file: model loading can print to stdout
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            completed = subprocess.run(
+                [sys.executable, __file__, '--worker', backend, output.name,
+                 '--sentences', str(args.sentences), '--batch-size', str(args.batch_size)],
+                capture_output=True, text=True,
+            )
+            if completed.returncode != 0:
+                error = completed.stderr.strip().splitlines()
+                print(f"{backend}: failed ({error[-1] if error else 'no output'})")
+                continue
+            with open(output.name, encoding='utf-8') as f:
+                results.append(json.load(f))
+
+    reference = next((r['outputs'] for r in results if r['backend'] == 'fp32'), None)
+    print(f"{'backend':<8} {'load s':>8} {'ms/sent':>8} {'peak MB':>8} {'similarity':>10} {'exact':>6}")
+    for result in results:
+        if reference is not None:
+            result['similarity'], result['exact_match'] = similarity(result['outputs'], reference)
+        print(f"{result['backend']:<8} {result['load_seconds']:>8.1f} {result['ms_per_sentence']:>8.1f} "
+              f"{result['peak_rss_mb']:>8.0f} {result.get('similarity', float('nan')):>10.3f} {result.get('exact_match', float('nan')):>6.2f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
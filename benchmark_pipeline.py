@@ -0,0 +1,212 @@
+"""
+Times every pipeline stage on deterministic synthetic textbooks.
+
+Textbooks are generated with PyMuPDF from a seed, so runs are comparable across
+machines and no copyrighted PDFs are needed. The page cache is disabled for the run, so
+every stage reads the PDFs themselves. Each stage records wall and CPU time, throughput
+and peak memory traced with tracemalloc (which slows every stage alike). Results can be
+saved as a JSON baseline, and a later run compared against it reports throughput or
+memory regressions beyond --tolerance.
+
+    python benchmark_pipeline.py --save-baseline bench.json
+    python benchmark_pipeline.py --baseline bench.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import fitz
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ra', 'tu', 'vi', 'so', 'de', 'pa', 'gri', 'mon', 'tal', 'ber', 'sen', 'dor']
+
+
+def synthetic_vocabulary(size, rng):
+    """size distinct pseudo-words of two to four syllables."""
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_textbook(path, pages=120, chapters=8, toc_depth=2, vocabulary_size=2000, seed=0):
+    """
+    Writes a synthetic textbook to path and returns path; the same arguments give the same bytes.
+
+    Words follow a Zipf-like distribution over a generated vocabulary. The TOC has front
+    and back matter (preface, index) around `chapters` chapters, each nested toc_depth
+    levels deep, so chapter segmentation and section exclusion are exercised.
+    """
+    rng = random.Random(seed)
+    vocabulary = synthetic_vocabulary(vocabulary_size, rng)
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    doc = fitz.open()
+    toc = [[1, 'Preface', 1]]
+    body_pages = pages - 2
+    for chapter in range(chapters):
+        start = 2 + chapter * body_pages // chapters
+        toc.append([1, f'Chapter {chapter + 1} {vocabulary[chapter].title()}', start])
+        for level in range(2, toc_depth + 1):
+            toc.append([level, f'{chapter + 1}.{level - 1} {vocabulary[chapter + level].title()}', start])
+    toc.append([1, 'Index', pages])
+    for page_num in range(pages):
+        page = doc.new_page()
+        text = ' '.join(rng.choices(vocabulary, weights, k=350))
+        page.insert_textbox(fitz.Rect(50, 50, 560, 800), text, fontsize=9)
+    doc.set_toc(toc)
+    doc.set_metadata({'title': f'Synthetic Textbook {seed}', 'author': 'Ada Lovelace and Alan Turing',
+                      'creationDate': 'D:2020', 'modDate': 'D:2020'})
+    # A fixed file identifier keeps the output byte-identical across runs
+    doc.save(path, no_new_id=True)
+    doc.close()
+    return path
+
+
+def measure(name, function, items_of):
+    """Runs function once and returns (result, measurements); failures are recorded, not raised."""
+    tracemalloc.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        result, error = function(), None
+    except Exception as e:
+        result, error = None, f"{type(e).__name__}: {e}"
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    items = items_of(result) if error is None else 0
+    stage = {
+        'seconds': wall,
+        'cpu_seconds': cpu,
+        'items': items,
+        'items_per_second': items / wall if wall > 0 else 0.0,
+        'peak_mb': peak / (1 << 20),
+        'error': error,
+    }
+    status = error or f"{items} items, {stage['items_per_second']:.0f}/s, peak {stage['peak_mb']:.1f} MB"
+    print(f"{name:<12} {wall:8.3f}s  {status}", file=sys.stderr)
+    return result, stage
+
+
+def run_benchmarks(book_paths):
+    """Runs every stage over the books and returns {stage: measurements}."""
+    import algorithms
+    import page_cache
+    import paraphrase_cache
+    import print_output
+    import test_try
+    from chapter_segmentation import segment_chapters
+    from education_data import adjectives, exclude_sections, nouns, templates, verbs
+    from generation_service import StubParaphraser
+    from pdf_extractor import iter_page_text
+    from preprocessing import preprocess_text
+
+    # Cached pages would make stages time the cache's state rather than the code, and fill
+    # the user's cache with throwaway books
+    page_cache.ENABLED = False
+    stages = {}
+    pages, stages['extract'] = measure(
+        'extract', lambda: [list(iter_page_text(path, use_cache=False)) for path in book_paths],
+        lambda books: sum(len(book) for book in books))
+
+    texts, stages['preprocess'] = measure(
+        'preprocess', lambda: [" ".join(preprocess_text(page) for page in book) for book in pages],
+        lambda books: sum(len(text.split()) for text in books))
+    if texts is None:
+        # Later stages still run, on raw text, when NLTK data is not installed
+        texts = [" ".join(book).lower() for book in pages]
+
+    # Throughput of the vectorising stages is measured in input tokens
+    tokens = sum(len(text.split()) for text in texts)
+    _, stages['similarity'] = measure(
+        'similarity', lambda: algorithms.similarity_to_first(algorithms.bow_for_comparing(texts)),
+        lambda scores: tokens)
+    topics, stages['topics'] = measure(
+        'topics', lambda: algorithms.create_bow_from_stream(texts)[2], lambda features: tokens)
+
+    segmented, stages['segment'] = measure(
+        'segment', lambda: segment_chapters(book_paths[0], exclude_sections),
+        lambda chapter_texts: len(chapter_texts))
+    chapters, stages['chapters'] = measure(
+        'chapters', lambda: test_try.extract_chapter_text(book_paths[0], exclude_sections),
+        lambda chapter_texts: len(chapter_texts))
+    if chapters is None and segmented:
+        chapters = {title: text.lower() for title, text in segmented.items()}
+    if chapters:
+        def outcomes():
+            vectorizer, _, _ = test_try.create_bow_from_chapters(chapters)
+            return test_try.generate_course_outcomes(chapters, vectorizer, rng=random.Random(0))
+        _, stages['outcomes'] = measure('outcomes', outcomes, lambda results: len(results))
+
+    # The model itself is stubbed: this measures batching, splitting and bookkeeping only
+    print_output.set_paraphraser(StubParaphraser())
+    paraphrase_cache.ENABLED = False
+    word_dict = {'adjectives': adjectives, 'nouns': nouns, 'verbs': verbs, 'topics': topics or ['synthetic topics']}
+    rng_state = random.getstate()
+    random.seed(0)
+    descriptions = [print_output.generate_description(templates, word_dict, f'Course {idx}') for idx in range(200)]
+    random.setstate(rng_state)
+    _, stages['paraphrase'] = measure(
+        'paraphrase', lambda: print_output.paraphrase_descriptions(descriptions),
+        lambda results: sum(len(print_output.split_sentences(text)) for text in results))
+    return stages
+
+
+def compare(results, baseline, tolerance):
+    """Regression messages for stages slower or hungrier than baseline by more than tolerance."""
+    regressions = []
+    if baseline.get('config') != results['config']:
+        regressions.append(f"config differs from baseline ({baseline.get('config')} vs {results['config']}); comparison is indicative only")
+    for name, stage in results['stages'].items():
+        before = baseline['stages'].get(name)
+        if before is None or before.get('error') or stage.get('error'):
+            continue
+        if before['items_per_second'] and stage['items_per_second'] < before['items_per_second'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {stage['items_per_second']:.0f}/s vs baseline {before['items_per_second']:.0f}/s")
+        if before['peak_mb'] and stage['peak_mb'] > before['peak_mb'] * (1 + tolerance):
+            regressions.append(f"{name}: peak memory {stage['peak_mb']:.1f} MB vs baseline {before['peak_mb']:.1f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, default=3)
+    parser.add_argument('--pages', type=int, default=120)
+    parser.add_argument('--chapters', type=int, default=8)
+    parser.add_argument('--toc-depth', type=int, default=2)
+    parser.add_argument('--vocabulary', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Write this run\'s results to this file')
+    parser.add_argument('--save-baseline', help='Write this run\'s results as the baseline')
+    parser.add_argument('--baseline', help='Compare against this baseline and exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative slowdown or memory growth')
+    args = parser.parse_args()
+
+    config = {'books': args.books, 'pages': args.pages, 'chapters': args.chapters,
+              'toc_depth': args.toc_depth, 'vocabulary': args.vocabulary, 'seed': args.seed}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        book_paths = [make_textbook(os.path.join(tmp_dir, f'book{idx}.pdf'), args.pages, args.chapters, args.toc_depth,
+                                    args.vocabulary, args.seed + idx) for idx in range(args.books)]
+        stages = run_benchmarks(book_paths)
+    results = {'config': config, 'python': platform.python_version(), 'machine': platform.machine(), 'stages': stages}
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if any(not regression.startswith('config') for regression in regressions):
+            sys.exit(1)
+        print("No regressions against baseline" if not regressions else "No stage regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
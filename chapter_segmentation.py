@@ -0,0 +1,86 @@
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+
+from pdf_extractor import document_session
+
+
+def _excluded(title, excluded):
+    # excluded holds lower-cased section names; matching is by substring, as in test_try
+    title = title.lower()
+    return any(section in title for section in excluded)
+
+
+def chapter_level(toc, excluded_sections):
+    """
+    TOC level that holds the chapters.
+
+    This is the level of the first entry matching an excluded section (front and back
+    matter usually sit beside the chapters), or else the top level of the TOC.
+    """
+    excluded = [section.lower() for section in excluded_sections]
+    for level, title, _ in toc:
+        if _excluded(title, excluded):
+            return level
+    return min(entry[0] for entry in toc)
+
+
+def chapter_ranges(toc, page_count, excluded_sections, level=None):
+    """
+    Returns (title, start_page, end_page) for every chapter, in TOC order.
+
+    Chapters are the entries at `level` (by default chapter_level) whose titles are not
+    excluded. Pages are 0-based and end_page is exclusive: a chapter runs until the next
+    chapter with a later start page. As test_try always did, the last chapter stops one
+    page before the end of the document.
+
+    The chapter start pages are sorted once and each end page is found by bisection,
+    so a TOC with thousands of entries is segmented in O(n log n).
+    """
+    if not toc:
+        return []
+    excluded = [section.lower() for section in excluded_sections]
+    if level is None:
+        level = chapter_level(toc, excluded)
+    chapters = [(title, page) for entry_level, title, page in toc if entry_level == level and not _excluded(title, excluded)]
+    starts = sorted({page for _, page in chapters})
+    ranges = []
+    for title, page in chapters:
+        following = bisect_right(starts, page)
+        end_page = starts[following] - 1 if following < len(starts) else page_count - 1
+        ranges.append((title, max(page - 1, 0), end_page))
+    return ranges
+
+
+def chapter_page_texts(doc, ranges):
+    """
+    Raw text of every range, reading each page of the document at most once.
+
+    Ranges from chapter_ranges never overlap except where chapters share a start page,
+    so pages are assigned to chapters in one pass over the distinct ranges.
+    """
+    texts = {}
+    for start_page, end_page in sorted({(start, end) for _, start, end in ranges}):
+        texts[start_page, end_page] = "".join(doc.iter_pages(start_page, end_page))
+    return [texts[start_page, end_page] for _, start_page, end_page in ranges]
+
+
+def segment_chapters(pdf_path, excluded_sections, clean=None, level=None, workers=None):
+    """
+    Returns {chapter title: text} for the chapters of pdf_path (a path or open Document).
+
+    clean is applied to each chapter's text; with workers it runs in a process pool,
+    one chapter per task, so it must be a module-level function.
+    """
+    with document_session(pdf_path) as doc:
+        ranges = chapter_ranges(doc.toc, doc.page_count, excluded_sections, level)
+        texts = chapter_page_texts(doc, ranges)
+    if clean is not None:
+        if workers and len(texts) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                texts = list(executor.map(clean, texts))
+        else:
+            texts = [clean(text) for text in texts]
+    chapter_texts = {}
+    for (title, _, _), text in zip(ranges, texts):
+        chapter_texts[title] = text
+    return chapter_texts
@@ -0,0 +1,88 @@
+import math
+from collections import Counter
+
+from ngram_stream import DEFAULT_CAPACITY, FrequentNgrams
+
+# Multi-word terms are joined with this, so "data mining" becomes the single token "data_mining"
+SEPARATOR = '_'
+
+
+class CollocationCounter:
+    """
+    Unigram and bigram counts accumulated one document at a time.
+
+    Documents are preprocessed texts (space-separated tokens) or token lists. Unigrams
+    are counted exactly; bigrams go into a FrequentNgrams table, so memory stays bounded
+    for a textbook-sized corpus and only rare bigrams can be lost.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.unigrams = Counter()
+        self.bigrams = FrequentNgrams(capacity)
+
+    def update(self, document):
+        tokens = document.split() if isinstance(document, str) else list(document)
+        self.unigrams.update(tokens)
+        self.bigrams.update([f"{first} {second}" for first, second in zip(tokens, tokens[1:])])
+
+    def update_many(self, documents):
+        for document in documents:
+            self.update(document)
+        return self
+
+    def scores(self, score='pmi', min_count=5):
+        """
+        Yields ((first, second), score) for every bigram seen at least min_count times.
+
+        score is 'pmi', log(P(first second) / (P(first) P(second))), or 'frequency'.
+        """
+        total = sum(self.unigrams.values())
+        for bigram, count in self.bigrams.counts.items():
+            if count < min_count:
+                continue
+            first, second = bigram.split(' ')
+            if score == 'frequency':
+                yield (first, second), count
+            elif score == 'pmi':
+                yield (first, second), math.log(count * total / (self.unigrams[first] * self.unigrams[second]))
+            else:
+                raise ValueError(f"Unknown collocation score {score!r}")
+
+
+def detect_phrases(documents, score='pmi', min_count=5, threshold=None, top_n=None, capacity=DEFAULT_CAPACITY):
+    """
+    Detects two-word phrases in one pass over documents.
+
+    Returns ((first, second), score) pairs, best first: those scoring at least threshold,
+    and at most top_n of them.
+    """
+    counter = CollocationCounter(capacity).update_many(documents)
+    phrases = counter.scores(score, min_count)
+    if threshold is not None:
+        phrases = (phrase for phrase in phrases if phrase[1] >= threshold)
+    return sorted(phrases, key=lambda phrase: phrase[1], reverse=True)[:top_n]
+
+
+def phrase_tokenizer(phrases):
+    """MWETokenizer that merges the given phrases (word tuples, or detect_phrases output) into single tokens."""
+    from nltk.tokenize import MWETokenizer
+    words = [phrase[0] if isinstance(phrase[0], tuple) else phrase for phrase in phrases]
+    return MWETokenizer([tuple(phrase) for phrase in words], separator=SEPARATOR)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from pdf_extractor import iter_page_text
+    from preprocessing import preprocess_text
+
+    parser = argparse.ArgumentParser(description="List the strongest two-word phrases in a PDF.")
+    parser.add_argument('pdf')
+    parser.add_argument('--score', choices=['pmi', 'frequency'], default='pmi')
+    parser.add_argument('--min-count', type=int, default=5)
+    parser.add_argument('-n', type=int, default=30)
+    args = parser.parse_args()
+
+    pages = (preprocess_text(page) for page in iter_page_text(args.pdf))
+    for (first, second), value in detect_phrases(pages, args.score, args.min_count, top_n=args.n):
+        print(f"{value:8.2f}  {first} {second}")
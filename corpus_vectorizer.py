@@ -0,0 +1,187 @@
+import json
+import os
+
+import numpy as np
+
+# Default location of the library-wide model used by main.main
+CORPUS_MODEL_PATH = os.environ.get('SYLLAGENIUS_CORPUS_MODEL', os.path.join(os.path.expanduser('~'), '.cache', 'syllagenius', 'corpus_model.npz'))
+
+
+class CorpusVectorizer:
+    """
+    Unigram+bigram TF-IDF model fitted once over the textbook library and then reused.
+
+    Instead of refitting a vectorizer per run, the vocabulary and document frequencies are
+    kept and saved; later runs only transform. New books are folded in with partial_fit,
+    which appends new terms at the end of the vocabulary so existing columns never move.
+    IDF uses the same smoothed formula as scikit-learn's TfidfVectorizer.
+    """
+
+    def __init__(self, ngram_range=(1, 2), stop_words='english'):
+        self.ngram_range = tuple(ngram_range)
+        self.stop_words = stop_words
+        self.vocabulary = {}
+        # Grown by doubling so adding a book costs O(its terms), not O(vocabulary)
+        self._df_buffer = np.zeros(0, dtype=np.int64)
+        self.n_documents = 0
+        # Keys (e.g. PDF content hashes) of the documents already counted
+        self.document_keys = set()
+        self._vectorizer = None
+        self._counter = None
+
+    @property
+    def document_frequency(self):
+        return self._df_buffer[:len(self.vocabulary)]
+
+    def _analyzer(self):
+        from sklearn.feature_extraction.text import CountVectorizer
+        return CountVectorizer(ngram_range=self.ngram_range, stop_words=self.stop_words).build_analyzer()
+
+    def partial_fit(self, texts, keys=None):
+        """
+        Adds documents to the vocabulary and document frequencies.
+
+        Documents whose key is already known are skipped, so a library can be re-scanned
+        and only new books are counted. Returns the number of documents added.
+        """
+        analyzer = self._analyzer()
+        keys = keys if keys is not None else [None] * len(texts)
+        added = 0
+        for text, key in zip(texts, keys):
+            if key is not None and key in self.document_keys:
+                continue
+            columns = [self.vocabulary.setdefault(term, len(self.vocabulary)) for term in set(analyzer(text))]
+            if len(self.vocabulary) > len(self._df_buffer):
+                grown = np.zeros(max(2 * len(self._df_buffer), len(self.vocabulary)), dtype=np.int64)
+                grown[:len(self._df_buffer)] = self._df_buffer
+                self._df_buffer = grown
+            # Columns are distinct within one document, so plain fancy-index addition is safe
+            self._df_buffer[np.asarray(columns, dtype=np.int64)] += 1
+            self.n_documents += 1
+            if key is not None:
+                self.document_keys.add(key)
+            added += 1
+        if added:
+            self._vectorizer = None
+            self._counter = None
+        return added
+
+    def fit(self, texts, keys=None):
+        """Discards any previous state and fits the model on texts."""
+        self.vocabulary = {}
+        self._df_buffer = np.zeros(0, dtype=np.int64)
+        self.n_documents = 0
+        self.document_keys = set()
+        self.partial_fit(texts, keys)
+        return self
+
+    def idf(self):
+        return np.log((1 + self.n_documents) / (1 + self.document_frequency)) + 1
+
+    @property
+    def vectorizer(self):
+        """A TfidfVectorizer frozen to this model's vocabulary and IDF, for transform-only use."""
+        if self._vectorizer is None:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            vectorizer = TfidfVectorizer(ngram_range=self.ngram_range, stop_words=self.stop_words, vocabulary=self.vocabulary)
+            vectorizer.idf_ = self.idf()
+            self._vectorizer = vectorizer
+        return self._vectorizer
+
+    def transform(self, texts):
+        return self.vectorizer.transform(texts)
+
+    def counts(self, texts):
+        """
+        Raw term counts over the current vocabulary, for weighting later with weigh().
+
+        Counts do not depend on document frequencies, so they stay valid as books are
+        added; weigh(counts(texts)) equals transform(texts).
+        """
+        if self._counter is None:
+            from sklearn.feature_extraction.text import CountVectorizer
+            self._counter = CountVectorizer(ngram_range=self.ngram_range, stop_words=self.stop_words, vocabulary=self.vocabulary)
+        return self._counter.transform(texts)
+
+    def weigh(self, counts):
+        """L2-normalised TF-IDF rows from counts() output, using the current IDF."""
+        from scipy import sparse
+        from sklearn.preprocessing import normalize
+        # The vocabulary only grows, so counts taken earlier may be narrower than the IDF
+        return normalize(sparse.csr_matrix(counts, dtype=np.float64) @ sparse.diags(self.idf()[:counts.shape[1]]))
+
+    def feature_names(self):
+        names = np.empty(len(self.vocabulary), dtype=object)
+        for term, column in self.vocabulary.items():
+            names[column] = term
+        return names
+
+    def save(self, path=None):
+        path = path or CORPUS_MODEL_PATH
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Terms never contain newlines (they are runs of word characters), so one joined
+        # byte string stores the vocabulary far more compactly than a fixed-width array
+        terms = '\n'.join(self.feature_names()).encode('utf-8')
+        params = {'ngram_range': self.ngram_range, 'stop_words': self.stop_words, 'n_documents': self.n_documents}
+        tmp_path = f"{path}.tmp-{os.getpid()}.npz"
+        np.savez(
+            tmp_path,
+            terms=np.frombuffer(terms, dtype=np.uint8),
+            document_frequency=self.document_frequency,
+            document_keys=np.array(sorted(self.document_keys), dtype=str),
+            params=np.array(json.dumps(params)),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=None):
+        with np.load(path or CORPUS_MODEL_PATH) as data:
+            params = json.loads(str(data['params']))
+            model = cls(params['ngram_range'], params['stop_words'])
+            terms = data['terms'].tobytes().decode('utf-8')
+            model.vocabulary = {term: column for column, term in enumerate(terms.split('\n'))} if terms else {}
+            model._df_buffer = data['document_frequency'].astype(np.int64)
+            model.document_keys = set(data['document_keys'].tolist())
+            model.n_documents = params['n_documents']
+        return model
+
+
+def load_or_create(path=None):
+    """Loads the saved corpus model, or returns an empty one if none has been saved yet."""
+    path = path or CORPUS_MODEL_PATH
+    return CorpusVectorizer.load(path) if os.path.exists(path) else CorpusVectorizer()
+
+
+def update_from_library(pdf_paths, path=None):
+    """
+    Folds every not-yet-seen PDF in pdf_paths into the saved corpus model and saves it.
+
+    Books are keyed by content hash and preprocessed the same way main.main does,
+    so a re-scan of the whole library only reads new or changed books.
+    """
+    from page_cache import file_digest
+    from pdf_extractor import find_introduction_page, iter_text_from_introduction_onwards
+    from preprocessing import preprocess_pages
+
+    model = load_or_create(path)
+    for pdf_path in pdf_paths:
+        key = file_digest(pdf_path)
+        if key in model.document_keys:
+            continue
+        start_page = find_introduction_page(pdf_path) or 0
+        model.partial_fit([preprocess_pages(iter_text_from_introduction_onwards(pdf_path, start_page))], [key])
+        print(f"Added {pdf_path} ({len(model.vocabulary)} terms)")
+    model.save(path)
+    return model
+
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description="Fit or update the library-wide TF-IDF model from a directory of PDFs.")
+    parser.add_argument('library', help="Directory containing the textbook PDFs")
+    parser.add_argument('--model', default=CORPUS_MODEL_PATH, help="Where the model is stored")
+    args = parser.parse_args()
+    update_from_library(sorted(glob.glob(os.path.join(args.library, '**', '*.pdf'), recursive=True)), args.model)
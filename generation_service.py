@@ -0,0 +1,265 @@
+"""
+Local HTTP service that keeps the course-generation pipeline loaded between requests.
+
+    python generation_service.py --port 8765 [--workers 2] [--stub]
+
+    GET  /health      queue depth and batch counts
+    POST /paraphrase  {"text": "..."} or {"sentences": ["...", ...]}
+    POST /course      {"title": "...", "main": "main.pdf", "supporting": ["a.pdf"],
+                       "threshold": 50, "below_threshold": "continue"}
+
+The paraphrase model and NLTK data load once for the life of the process. Extraction,
+preprocessing and scoring run in a process pool; paraphrasing runs on one thread that
+owns the model. Paraphrase requests arriving together are coalesced into one batch, and
+requests beyond the bounded queue are refused with 503 instead of piling up. With
+--paraphrase-workers N each batch is spread over N forked workers sharing the one loaded
+model. --stub installs a model-free paraphraser, so the service can be exercised on localhost.
+"""
+import asyncio
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import paraphrase_cache
+import print_output
+
+# Most sentences coalesced into one micro-batch; they go through the model in forward passes
+# of print_output.PARAPHRASE_BATCH_SIZE sentences
+MAX_BATCH_SENTENCES = 32
+# Longest a request waits for others to join its micro-batch
+MAX_WAIT_SECONDS = 0.02
+# Paraphrase requests queued before new ones are refused
+MAX_QUEUED_REQUESTS = 256
+MAX_BODY_BYTES = 1 << 20
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+           500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class ServiceBusy(Exception):
+    """The service is at capacity; the client should retry later."""
+
+
+class StubParaphraser:
+    """Pipeline stand-in for tests: returns each sentence unchanged and counts its calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, sentences, max_length=60, batch_size=1):
+        self.calls.append(len(sentences))
+        return [{'generated_text': sentence} for sentence in sentences]
+
+
+class ParaphraseBatcher:
+    """
+    Coalesces concurrent paraphrase requests into micro-batches.
+
+    A batch is sent to the model once it holds max_batch sentences or its first request
+    has waited max_wait seconds, whichever comes first. The request queue holds at most
+    max_queue requests; submitting to a full queue raises ServiceBusy.
+    """
+
+    def __init__(self, max_batch=MAX_BATCH_SENTENCES, max_wait=MAX_WAIT_SECONDS, max_queue=MAX_QUEUED_REQUESTS):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue(max_queue)
+        # One thread owns the model, so batches never run concurrently on it
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self.batches = 0
+        self.sentences = 0
+
+    async def paraphrase(self, sentences):
+        if not sentences:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((sentences, future))
+        except asyncio.QueueFull:
+            raise ServiceBusy("Paraphrase queue is full") from None
+        return await future
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        items = [await self.queue.get()]
+        count = len(items[0][0])
+        deadline = loop.time() + self.max_wait
+        while count < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            items.append(item)
+            count += len(item[0])
+        return items
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._next_batch()
+            sentences = [sentence for request, _ in items for sentence in request]
+            try:
+                paraphrased = await loop.run_in_executor(
+                    self._executor, lambda: print_output.paraphrase_sentences(sentences))
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.sentences += len(sentences)
+            paraphrased = iter(paraphrased)
+            for request, future in items:
+                result = [next(paraphrased) for _ in request]
+                if not future.done():  # the client may have disconnected
+                    future.set_result(result)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def _prepare_course(payload):
+    # Runs in a worker process: everything up to the paraphrase, which the service batches
+    from main import run_course
+    return run_course(payload['title'], payload['main'], payload.get('supporting') or [],
+                      threshold=float(payload.get('threshold', 50.0)),
+                      below_threshold=payload.get('below_threshold', 'continue'),
+                      corpus_model_path=payload.get('corpus_model'), paraphrase=False)
+
+
+class GenerationService:
+    """HTTP front end over a ParaphraseBatcher and a process pool for the CPU-bound course stages."""
+
+    def __init__(self, workers=1, max_batch=MAX_BATCH_SENTENCES, max_wait=MAX_WAIT_SECONDS, max_queue=MAX_QUEUED_REQUESTS):
+        self.workers = workers
+        self.batcher = ParaphraseBatcher(max_batch, max_wait, max_queue)
+        self._course_executor = None
+        self._courses_running = 0
+        self._batcher_task = None
+
+    async def start(self, host='127.0.0.1', port=8765):
+        """Starts the batcher and listens on host:port; returns the asyncio server."""
+        self._batcher_task = asyncio.create_task(self.batcher.run())
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        if self._batcher_task is not None:
+            self._batcher_task.cancel()
+        self.batcher.close()
+        if self._course_executor is not None:
+            self._course_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def paraphrase(self, payload):
+        if 'sentences' in payload:
+            return {'paraphrases': await self.batcher.paraphrase(list(payload['sentences']))}
+        sentences = print_output.split_sentences(payload['text'])
+        return {'paraphrase': " ".join(await self.batcher.paraphrase(sentences))}
+
+    async def course(self, payload):
+        # Courses beyond twice the pool size are refused rather than queued without bound
+        if self._courses_running >= 2 * self.workers:
+            raise ServiceBusy("Too many courses in progress")
+        if self._course_executor is None:
+            # Workers are started from a clean server process rather than forked from this one,
+            # which has threads running and may hold the loaded model
+            self._course_executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('forkserver'))
+        self._courses_running += 1
+        try:
+            record = await asyncio.get_running_loop().run_in_executor(self._course_executor, _prepare_course, payload)
+        finally:
+            self._courses_running -= 1
+        if record.get('generated_description'):
+            sentences = print_output.split_sentences(record['generated_description'])
+            record['description'] = " ".join(await self.batcher.paraphrase(sentences))
+        return record
+
+    def health(self):
+        return {'status': 'ok', 'queued': self.batcher.queue.qsize(), 'batches': self.batcher.batches,
+                'sentences': self.batcher.sentences, 'courses_running': self._courses_running}
+
+    async def dispatch(self, method, path, body):
+        if method == 'GET' and path == '/health':
+            return 200, self.health()
+        if method == 'POST' and path in ('/paraphrase', '/course'):
+            payload = json.loads(body or b'{}')
+            if path == '/paraphrase':
+                return 200, await self.paraphrase(payload)
+            return 200, await self.course(payload)
+        return 404, {'error': f"No route for {method} {path}"}
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length', 0))
+            if len(request_line) < 2:
+                status, payload = 400, {'error': 'Malformed request line'}
+            elif length > MAX_BODY_BYTES:
+                status, payload = 413, {'error': f"Body larger than {MAX_BODY_BYTES} bytes"}
+            else:
+                body = await reader.readexactly(length) if length else b''
+                status, payload = await self.dispatch(request_line[0], request_line[1], body)
+        except ServiceBusy as e:
+            status, payload = 503, {'error': str(e)}
+        except (ValueError, KeyError, TypeError) as e:
+            status, payload = 400, {'error': f"{type(e).__name__}: {e}"}
+        except Exception as e:
+            status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+        body = json.dumps(payload).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n")
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        writer.write(head.encode('latin-1') + b"\r\n" + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host='127.0.0.1', port=8765, workers=1, stub=False, paraphrase_workers=None):
+    if stub:
+        print_output.set_paraphraser(StubParaphraser())
+        # Stub output must never end up in the shared paraphrase cache
+        paraphrase_cache.ENABLED = False
+    paraphrase_workers = print_output.PARAPHRASE_WORKERS if paraphrase_workers is None else paraphrase_workers
+    if paraphrase_workers > 1:
+        # Forked before any executor thread exists or any inference runs; this loads the model too
+        print_output.start_paraphrase_pool(paraphrase_workers)
+    elif not stub:
+        # Load the model before accepting requests rather than on the first one
+        await asyncio.get_running_loop().run_in_executor(None, print_output.get_paraphraser)
+    service = GenerationService(workers)
+    server = await service.start(host, port)
+    print(f"Serving on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+        print_output.stop_paraphrase_pools()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=1, help="Processes for extraction and scoring")
+    parser.add_argument('--paraphrase-workers', type=int,
+                        help="Processes sharing one loaded paraphrase model (default: SYLLAGENIUS_PARAPHRASE_WORKERS)")
+    parser.add_argument('--stub', action='store_true', help="Use a stub paraphraser instead of loading the model")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.workers, args.stub, args.paraphrase_workers))
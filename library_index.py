@@ -0,0 +1,265 @@
+import json
+import os
+
+import numpy as np
+
+import corpus_vectorizer
+
+# Default location of the library index: <dir>/counts.npz, <dir>/books.json and <dir>/sketch.npy
+LIBRARY_INDEX_DIR = os.environ.get('SYLLAGENIUS_LIBRARY_INDEX', os.path.join(os.path.expanduser('~'), '.cache', 'syllagenius', 'library_index'))
+# Width of the count-sketch used by approximate search, and the seed of its hash functions
+SKETCH_DIMENSIONS = 1024
+SKETCH_SEED = 13
+# Large prime for the universal hash that maps vocabulary columns to sketch buckets
+_PRIME = 2_147_483_647
+
+
+def _sketch_hashes(n_columns, dimensions=SKETCH_DIMENSIONS, seed=SKETCH_SEED):
+    """Bucket and sign for every vocabulary column; computed, never stored, so any vocabulary size works."""
+    rng = np.random.default_rng(seed)
+    a, b, c, d = (int(x) for x in rng.integers(1, _PRIME, size=4))
+    columns = np.arange(n_columns, dtype=np.int64)
+    buckets = (a * columns + b) % _PRIME % dimensions
+    signs = np.where((c * columns + d) % _PRIME % 2 == 0, 1.0, -1.0).astype(np.float32)
+    return buckets, signs
+
+
+def sketch(matrix, dimensions=SKETCH_DIMENSIONS):
+    """
+    Projects L2-normalised sparse rows into a dense count-sketch, then re-normalises them.
+
+    Dot products between sketches estimate the cosine similarity of the original rows.
+    """
+    matrix = matrix.tocoo()
+    buckets, signs = _sketch_hashes(matrix.shape[1], dimensions)
+    dense = np.zeros((matrix.shape[0], dimensions), dtype=np.float32)
+    np.add.at(dense, (matrix.row, buckets[matrix.col]), matrix.data.astype(np.float32) * signs[matrix.col])
+    norms = np.linalg.norm(dense, axis=1, keepdims=True)
+    return dense / np.where(norms == 0, 1, norms)
+
+
+def _top_k(scores, k):
+    """Indices of the k highest scores, best first, via partial selection instead of a full sort."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class LibraryIndex:
+    """
+    Persistent index of term counts for every book in the library.
+
+    Counts are taken over the shared corpus_vectorizer vocabulary and stored as one
+    float32 CSR matrix; they are weighted with the corpus model's current IDF when
+    scored, so every book is scored with the same IDF however late it was added.
+    Queries score the main text against every book with sparse one-vs-many products,
+    block_rows books at a time. For large libraries an approximate mode scores dense
+    count-sketches first and only reranks the best candidates exactly.
+    """
+
+    def __init__(self, corpus_model=None):
+        from scipy import sparse
+        self.corpus_model = corpus_model or corpus_vectorizer.load_or_create()
+        self.books = []  # {'title', 'path', 'key'} per matrix row
+        self.counts = sparse.csr_matrix((0, 0), dtype=np.float32)
+        # TF-IDF rows and sketches, valid for the corpus model state they were weighted with
+        self._matrix = None
+        self._sketches = None
+        self._state = None
+
+    def _model_state(self):
+        # Document frequencies only change when documents are added, which also grows n_documents
+        return [self.corpus_model.n_documents, len(self.corpus_model.vocabulary)]
+
+    def _invalidate(self):
+        self._matrix = None
+        self._sketches = None
+
+    def _check_state(self):
+        state = self._model_state()
+        if state != self._state:
+            self._invalidate()
+            self._state = state
+
+    def _resize(self, matrix, n_columns):
+        # The corpus vocabulary only grows, so older rows are widened with empty columns
+        from scipy import sparse
+        matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+        if matrix.shape[1] < n_columns:
+            matrix = sparse.csr_matrix((matrix.data, matrix.indices, matrix.indptr), shape=(matrix.shape[0], n_columns))
+        return matrix
+
+    def add(self, title, text, path=None, key=None):
+        """Adds one book's preprocessed text; a book whose key is already indexed is replaced."""
+        self.add_many([(title, text, path, key)])
+
+    def add_many(self, entries):
+        """Adds (title, text, path, key) entries with one count and one matrix rebuild."""
+        from scipy import sparse
+        if not entries:
+            return
+        for _, _, _, key in entries:
+            if key is not None:
+                self.remove(key)
+        counts = self.corpus_model.counts([text for _, text, _, _ in entries])
+        n_columns = max(self.counts.shape[1], counts.shape[1])
+        self.counts = sparse.vstack([self._resize(self.counts, n_columns), self._resize(counts, n_columns)], format='csr')
+        self.books.extend({'title': title, 'path': path, 'key': key} for title, _, path, key in entries)
+        self._invalidate()
+
+    def remove(self, key):
+        keep = [row for row, book in enumerate(self.books) if book['key'] != key]
+        if len(keep) != len(self.books):
+            self.counts = self.counts[keep]
+            self.books = [self.books[row] for row in keep]
+            self._invalidate()
+
+    @property
+    def matrix(self):
+        """L2-normalised TF-IDF rows of every book under the corpus model's current IDF."""
+        self._check_state()
+        if self._matrix is None:
+            self._matrix = self.corpus_model.weigh(self.counts).astype(np.float32).tocsr()
+        return self._matrix
+
+    def _align(self, query_vector):
+        # Query terms added to the vocabulary after the last indexed book cannot match any book
+        n_columns = self.counts.shape[1]
+        return self._resize(query_vector, n_columns)[:, :n_columns]
+
+    def sketches(self):
+        self._check_state()
+        if self._sketches is None:
+            self._sketches = sketch(self.matrix)
+        return self._sketches
+
+    def scores(self, query_vector, block_rows=4096):
+        """Cosine similarity of one L2-normalised query row against every indexed book."""
+        query = self._align(query_vector).T.tocsc()
+        matrix = self.matrix
+        scores = np.zeros(len(self.books), dtype=np.float32)
+        for start in range(0, len(self.books), block_rows):
+            block = matrix[start:start + block_rows]
+            scores[start:start + block.shape[0]] = (block @ query).toarray().ravel()
+        return scores
+
+    def query(self, text, k=5, approximate=False, candidates=None, exclude_keys=(), block_rows=4096):
+        """
+        Returns up to k (book, score) pairs for the books most similar to text, best first.
+
+        With approximate=True only the `candidates` books (default 20 * k) that score best
+        on their sketches are scored exactly.
+        """
+        if not self.books:
+            return []
+        query_vector = self.corpus_model.transform([text])
+        if approximate:
+            query = self._align(query_vector)
+            rows = np.sort(_top_k(self.sketches() @ sketch(query)[0], candidates or 20 * k))
+            scores = np.full(len(self.books), -np.inf, dtype=np.float32)
+            query = query.T.tocsc()
+            scores[rows] = (self.matrix[rows] @ query).toarray().ravel()
+        else:
+            scores = self.scores(query_vector, block_rows)
+        for row, book in enumerate(self.books):
+            if book['key'] in exclude_keys:
+                scores[row] = -np.inf
+        return [(self.books[row], float(scores[row])) for row in _top_k(scores, k) if np.isfinite(scores[row])]
+
+    def save(self, index_dir=None):
+        from scipy import sparse
+        index_dir = index_dir or LIBRARY_INDEX_DIR
+        os.makedirs(index_dir, exist_ok=True)
+        sparse.save_npz(os.path.join(index_dir, 'counts.npz'), self.counts, compressed=False)
+        np.save(os.path.join(index_dir, 'sketch.npy'), self.sketches())
+        with open(os.path.join(index_dir, 'books.json'), 'w', encoding='utf-8') as f:
+            json.dump({'books': self.books, 'model_state': self._state}, f)
+
+    @classmethod
+    def load(cls, index_dir=None, corpus_model=None, corpus_model_path=None):
+        """Loads a saved index, scored with corpus_model or else the model saved at corpus_model_path."""
+        from scipy import sparse
+        index_dir = index_dir or LIBRARY_INDEX_DIR
+        index = cls(corpus_model or corpus_vectorizer.load_or_create(corpus_model_path))
+        index.counts = sparse.load_npz(os.path.join(index_dir, 'counts.npz')).astype(np.float32).tocsr()
+        with open(os.path.join(index_dir, 'books.json'), encoding='utf-8') as f:
+            saved = json.load(f)
+        index.books = saved['books']
+        sketch_path = os.path.join(index_dir, 'sketch.npy')
+        if os.path.exists(sketch_path) and saved['model_state'] == index._model_state():
+            # Memory-mapped, so exact-only use never reads the sketches from disk. Sketches
+            # weighted under another state of the corpus model are rebuilt when needed
+            index._state = saved['model_state']
+            index._sketches = np.load(sketch_path, mmap_mode='r')
+        return index
+
+
+def load_or_create(index_dir=None, corpus_model=None):
+    index_dir = index_dir or LIBRARY_INDEX_DIR
+    # Indexes from before counts.npz held IDF-weighted vectors; they are rebuilt from scratch
+    if os.path.exists(os.path.join(index_dir, 'counts.npz')):
+        return LibraryIndex.load(index_dir, corpus_model)
+    return LibraryIndex(corpus_model)
+
+
+def book_text(pdf_path):
+    """Preprocessed text of a book, prepared the same way as in main.main."""
+    from pdf_extractor import find_introduction_page, iter_text_from_introduction_onwards
+    from preprocessing import preprocess_pages
+    start_page = find_introduction_page(pdf_path) or 0
+    return preprocess_pages(iter_text_from_introduction_onwards(pdf_path, start_page))
+
+
+def build(pdf_paths, index_dir=None, corpus_model_path=None):
+    """
+    Indexes every PDF in pdf_paths that is not already indexed, and saves the index.
+
+    The corpus model is updated with the new books first so their terms are in the vocabulary.
+    """
+    from page_cache import file_digest
+    corpus_model = corpus_vectorizer.update_from_library(pdf_paths, corpus_model_path)
+    index = load_or_create(index_dir, corpus_model)
+    indexed = {book['key'] for book in index.books}
+    entries = []
+    for pdf_path in pdf_paths:
+        key = file_digest(pdf_path)
+        if key not in indexed:
+            entries.append((os.path.splitext(os.path.basename(pdf_path))[0], book_text(pdf_path), pdf_path, key))
+    index.add_many(entries)
+    index.save(index_dir)
+    return index
+
+
+def suggest_supporting_texts(main_path, k=2, index_dir=None, approximate=False, corpus_model_path=None):
+    """Returns (book, score) for the k indexed books most similar to the main PDF, excluding itself."""
+    from page_cache import file_digest
+    index = LibraryIndex.load(index_dir, corpus_model_path=corpus_model_path)
+    return index.query(book_text(main_path), k, approximate=approximate, exclude_keys={file_digest(main_path)})
+
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+
+    # --index is accepted after the subcommand, where its other arguments go
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--index', default=LIBRARY_INDEX_DIR)
+    common.add_argument('--corpus-model', default=corpus_vectorizer.CORPUS_MODEL_PATH, help="Corpus model the index is weighted with")
+    parser = argparse.ArgumentParser(description="Build or query the library-wide nearest-textbook index.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', parents=[common], help="Index every PDF under a directory")
+    build_parser.add_argument('library')
+    query_parser = subparsers.add_parser('query', parents=[common], help="List the books most similar to a main PDF")
+    query_parser.add_argument('main_pdf')
+    query_parser.add_argument('-k', type=int, default=5)
+    query_parser.add_argument('--approximate', action='store_true')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        index = build(sorted(glob.glob(os.path.join(args.library, '**', '*.pdf'), recursive=True)), args.index, args.corpus_model)
+        print(f"Indexed {len(index.books)} books")
+    else:
+        for book, score in suggest_supporting_texts(args.main_pdf, args.k, args.index, args.approximate, args.corpus_model):
+            print(f"{100 * score:6.2f}%  {book['title']}  ({book['path']})")
@@ -1,42 +1,130 @@
-from pdf_extractor import find_introduction_page, extract_text_from_introduction_onwards
-from preprocessing import preprocess_text
-from print_output import print_chapters, generate_description, paraphrase_description
-from algorithms import bow_for_comparing, calculate_cosine_similarity, create_bow_from_text
+from contextlib import ExitStack
+from functools import partial
+from pdf_extractor import (Document, extract_documents_parallel, find_introduction_page,
+                           iter_text_from_introduction_onwards, text_from_introduction_onwards_parallel)
+from preprocessing import preprocess_pages
+from print_output import list_chapters, print_chapter_list, generate_description, paraphrase_description
+from algorithms import bow_for_comparing, similarity_to_first, create_bow_from_text, create_bow_from_stream
+import corpus_vectorizer
+import tracing
+from page_cache import file_digest
 from education_data import adjectives, nouns, verbs, templates
 
-def main(title, main_path, supporting_paths):
-    # Check if the main document path is provided
-    if not main_path:
-        print("No main PDF provided.")
-        return False
-    
-    start_page = find_introduction_page(main_path)
+def load_document_text(pdf_path, phrase_masker=None, workers=None):
+    """
+    Extracts and preprocesses a document from its introduction onwards, one page at a time.
+
+    pdf_path may be a path or an open pdf_extractor.Document session. A
+    phrase_masking.PhraseMasker strips its phrases from each page before preprocessing.
+    With workers, the pages are extracted by that many worker processes.
+    """
+    start_page = find_introduction_page(pdf_path)
+    if workers:
+        pages = text_from_introduction_onwards_parallel(pdf_path, start_page, workers)
+    else:
+        pages = iter_text_from_introduction_onwards(pdf_path, start_page)
+    if phrase_masker is not None:
+        pages = phrase_masker.mask_pages(pages)
+    return preprocess_pages(pages)
+
+def _load_masked_document_text(pdf_path, phrase_masker):
+    # Worker processes mask with a copy of the masker, so its counts travel back with the text
+    return load_document_text(pdf_path, phrase_masker), phrase_masker.counts
+
+def load_corpus_model(docs, texts, path=None):
+    """
+    Loads the saved library-wide corpus model and folds in any books it has not seen.
+
+    Books are keyed by PDF content hash, so the model is only updated and re-saved when
+    a new or modified book comes through.
+    """
+    corpus_model = corpus_vectorizer.load_or_create(path)
+    if corpus_model.partial_fit(texts, [file_digest(doc.pdf_path) for doc in docs]):
+        corpus_model.save(path)
+    return corpus_model
+
+def run_course(title, main_path, supporting_paths, threshold=50.0, below_threshold='continue', confirm=None,
+               workers=None, corpus_model_path=None, phrase_masker=None, paraphrase=True):
+    """
+    Generates one course and returns it as a dict instead of printing it.
 
-    # Extract and preprocess text from the main document
-    main_text = extract_text_from_introduction_onwards(main_path, start_page)
-    preprocess_main_text = preprocess_text(main_text)
+    Supporting books scoring under threshold percent similarity to the main book are
+    handled by policy: below_threshold='continue' goes on regardless and 'skip' stops
+    before the description is generated. confirm, if given, replaces the policy: it is
+    called with the similarity percentages and the threshold and returns whether to go on.
+
+    The record holds the status ('ok', 'skipped', 'cancelled' or 'no_supporting'),
+    similarity percentages per supporting book, topics, the paraphrased description,
+    and (title, page) chapter lists per book. With paraphrase=False the description is left
+    to the caller and only the generated (unparaphrased) description is filled in.
+    """
+    # Each PDF is opened once for the whole run and closed when run_course returns
+    with ExitStack() as stack:
+        stack.enter_context(tracing.span('main.run_course'))
+        main_doc = stack.enter_context(Document(main_path))
+        supporting_docs = [stack.enter_context(Document(path)) for path in supporting_paths or []]
+        return _run(title, main_doc, supporting_docs, threshold, below_threshold, confirm, workers, corpus_model_path, phrase_masker, paraphrase)
+
+def _run(title, main_doc, supporting_docs, threshold, below_threshold, confirm, workers, corpus_model_path, phrase_masker, paraphrase):
+    docs = [main_doc] + supporting_docs
+    record = {
+        'title': title,
+        'main': main_doc.pdf_path,
+        'supporting': [doc.pdf_path for doc in supporting_docs],
+        'status': None,
+        'similarity': [],
+        'below_threshold': False,
+        'topics': [],
+        'generated_description': None,
+        'description': None,
+        'chapters': {},
+    }
+    # Extract and preprocess every document, in parallel worker processes when workers is set
+    with tracing.span('main.load_documents', documents=len(docs)):
+        if workers and len(docs) > 1 and len(docs) >= workers:
+            # A document per worker: each extracts and preprocesses whole documents.
+            # Sessions cannot cross process boundaries, so workers open the PDFs by path
+            paths = [doc.pdf_path for doc in docs]
+            if phrase_masker is not None:
+                results = extract_documents_parallel(paths, workers, partial(_load_masked_document_text, phrase_masker=phrase_masker))
+                document_texts = [text for text, _ in results]
+                for _, counts in results:
+                    phrase_masker.counts.update(counts)
+            else:
+                document_texts = extract_documents_parallel(paths, workers, load_document_text)
+        elif workers:
+            # Fewer documents than workers: the pages of each document are spread over the workers
+            document_texts = [load_document_text(doc, phrase_masker, workers) for doc in docs]
+        else:
+            document_texts = [load_document_text(doc, phrase_masker) for doc in docs]
     
-    if not supporting_paths:
-        print("No supporting PDFs provided. Continue to main document only.")
-        print_chapters(main_path)
-        return
+    if not supporting_docs:
+        record['status'] = 'no_supporting'
+        record['chapters'][main_doc.pdf_path] = list_chapters(main_doc)
+        return record
     
     # Initialize lists for storing processed texts
-    texts = [preprocess_main_text]   
-    topictexts = preprocess_main_text
-    # Process each supporting document
-    for path in supporting_paths:
-        sup_start_page =  find_introduction_page(path)
-        supporting_text = extract_text_from_introduction_onwards(path, sup_start_page)
-        preprocess_supporting_text = preprocess_text(supporting_text)
-        texts.append(preprocess_supporting_text)
-        topictexts += preprocess_supporting_text
-
-
-    # Create BoW for all texts including the main document
-    _, _, bow = create_bow_from_text(topictexts)
-    bow_matrix = bow_for_comparing(texts)
-    similarity_matrix = calculate_cosine_similarity(bow_matrix)
+    texts = list(document_texts)
+
+    # With a saved corpus model the vocabulary and IDF are reused and only transformed;
+    # otherwise vectorizers are fitted on this run's texts
+    with tracing.span('main.corpus_model'):
+        corpus_model = load_corpus_model(docs, texts, corpus_model_path) if corpus_model_path else None
+
+    # Create BoW for all texts including the main document. Without a corpus model the topics
+    # are counted document by document in bounded memory rather than on one concatenated string
+    with tracing.span('main.topics'):
+        if corpus_model is not None:
+            _, _, bow = create_bow_from_text(' '.join(texts), corpus_model)
+        else:
+            _, _, bow = create_bow_from_stream(texts)
+    with tracing.span('main.similarity'):
+        bow_matrix = bow_for_comparing(texts, corpus_model)
+        similarity_scores = similarity_to_first(bow_matrix)
+    percentages = [float(score) * 100 for score in similarity_scores[1:]]
+    record['similarity'] = percentages
+    record['below_threshold'] = any(percentage < threshold for percentage in percentages)
+    record['topics'] = list(bow)
 
     word_dict = {
     'adjectives': adjectives,
@@ -45,47 +133,90 @@ def main(title, main_path, supporting_paths):
     'topics': bow
     }
 
-    # Handle different numbers of supporting documents
-    if len(supporting_paths) == 1:
-        similarity_percentage = similarity_matrix[0, 1] * 100
-        print(f"Comparison of Main Document with Supporting Document: {similarity_percentage}% similar.")
-
-        # Check if either document is significantly dissimilar
-        if similarity_percentage < 50.0:
-            response = input("Supporting document is not significantly similar. Do you still want to continue? Y/N ")
-            if response.lower() == 'y':
-                print("Continuing...")
-            else:
-                print("Operation cancelled.")
-                return
-        input("Please press Enter to continue")
-
-    elif len(supporting_paths) == 2:
-        similarity_percentage1 = similarity_matrix[0, 1] * 100
-        similarity_percentage2 = similarity_matrix[0, 2] * 100
-        print(f"Comparison of Main Document with Supporting Document 1: {similarity_percentage1}% similar.")
-        print(f"Comparison of Main Document with Supporting Document 2: {similarity_percentage2}% similar.")
-
-        # Check if either document is significantly dissimilar
-        if similarity_percentage1 < 50.0 or similarity_percentage2 < 50.0:
-            response = input("At least one supporting document is not significantly similar. Do you still want to continue? Y/N ")
-            if response.lower() == 'y':
-                print("Continuing...")
-            else:
-                print("Operation cancelled.")
-                return
+    if confirm is not None:
+        if not confirm(percentages, threshold):
+            record['status'] = 'cancelled'
+            return record
+    elif record['below_threshold'] and below_threshold == 'skip':
+        record['status'] = 'skipped'
+        return record
     
     # Generate course description
     generated_description = generate_description(templates, word_dict, title)
+    record['generated_description'] = generated_description
 
     # Get paraphrased description
-    paraphrased_description = paraphrase_description(generated_description)
-    print("\nCourse Description:", paraphrased_description)
+    if paraphrase:
+        with tracing.span('main.paraphrase'):
+            record['description'] = paraphrase_description(generated_description)
+
+    # Chapters for the main document and each supporting document
+    with tracing.span('main.chapters'):
+        for doc in docs:
+            record['chapters'][doc.pdf_path] = list_chapters(doc)
+    record['status'] = 'ok'
+    return record
+
+def confirm_interactively(percentages, threshold=50.0):
+    """Prints the similarity of each supporting document and asks whether to go on if any is below threshold."""
+    if len(percentages) == 1:
+        print(f"Comparison of Main Document with Supporting Document: {percentages[0]}% similar.")
+    else:
+        for idx, percentage in enumerate(percentages, start=1):
+            print(f"Comparison of Main Document with Supporting Document {idx}: {percentage}% similar.")
+
+    # Check if either document is significantly dissimilar
+    if any(percentage < threshold for percentage in percentages):
+        if len(percentages) == 1:
+            question = "Supporting document is not significantly similar. Do you still want to continue? Y/N "
+        else:
+            question = "At least one supporting document is not significantly similar. Do you still want to continue? Y/N "
+        response = input(question)
+        if response.lower() == 'y':
+            print("Continuing...")
+        else:
+            print("Operation cancelled.")
+            return False
+    if len(percentages) == 1:
+        input("Please press Enter to continue")
+    return True
+
+def main(title, main_path, supporting_paths, workers=None, corpus_model_path=None, phrase_masker=None, trace_path=None):
+    # Check if the main document path is provided
+    if not main_path:
+        print("No main PDF provided.")
+        return False
+
+    def run():
+        return run_course(title, main_path, supporting_paths, confirm=confirm_interactively,
+                          workers=workers, corpus_model_path=corpus_model_path, phrase_masker=phrase_masker)
+
+    # With a trace path (or SYLLAGENIUS_TRACE) every stage is timed and the trace written as JSON,
+    # also when the run fails
+    trace_path = trace_path or tracing.TRACE_PATH
+    if trace_path:
+        trace = tracing.Trace(memory=tracing.MEMORY, profile=tracing.PROFILE)
+        try:
+            with trace:
+                record = run()
+        finally:
+            trace.save(trace_path)
+            print(trace.summary())
+    else:
+        record = run()
+    if record['status'] == 'no_supporting':
+        print("No supporting PDFs provided. Continue to main document only.")
+        print_chapter_list(record['chapters'][main_path], 'Main Document')
+        return
+    if record['status'] != 'ok':
+        return
+
+    print("\nCourse Description:", record['description'])
 
     # Print chapters for the main document and each supporting document
-    print_chapters(main_path, 'Main Document')
-    for idx, path in enumerate(supporting_paths, start=1):
-        print_chapters(path, f'Supporting Document {idx}')
+    print_chapter_list(record['chapters'][main_path], 'Main Document')
+    for idx, path in enumerate(record['supporting'], start=1):
+        print_chapter_list(record['chapters'][path], f'Supporting Document {idx}')
 
 
        
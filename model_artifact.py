@@ -0,0 +1,86 @@
+import json
+import os
+import shutil
+import time
+
+# Bump when the layout of the artifact directory or of model.joblib changes
+ARTIFACT_FORMAT_VERSION = 1
+MODEL_FILE = 'model.joblib'
+MANIFEST_FILE = 'manifest.json'
+
+
+class IncompatibleArtifactError(RuntimeError):
+    """The artifact was written by a different format version or scikit-learn release."""
+
+
+def _sklearn_release():
+    import sklearn
+    # Pickled estimators are only guaranteed to load on the release that wrote them
+    return '.'.join(sklearn.__version__.split('.')[:2])
+
+
+def save_artifact(artifact_dir, vectorizer, model, metadata=None):
+    """
+    Saves a fitted vectorizer and classifier as one artifact directory.
+
+    model.joblib is written uncompressed, so the arrays inside it (coefficients,
+    support vectors, ...) can be memory-mapped on load. manifest.json records the
+    format version and scikit-learn release checked by load_artifact.
+    """
+    import joblib
+    import sklearn
+
+    tmp_dir = f"{artifact_dir.rstrip(os.sep)}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    joblib.dump({'vectorizer': vectorizer, 'model': model}, os.path.join(tmp_dir, MODEL_FILE))
+    manifest = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'sklearn_version': sklearn.__version__,
+        'vectorizer': type(vectorizer).__name__,
+        'model': type(model).__name__,
+        'vocabulary_size': len(getattr(vectorizer, 'vocabulary_', None) or ()),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'metadata': metadata or {},
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    if os.path.isdir(artifact_dir):
+        # A directory cannot be replaced while it has files in it, so the old one is moved aside first
+        old_dir = f"{artifact_dir.rstrip(os.sep)}.old-{os.getpid()}"
+        os.replace(artifact_dir, old_dir)
+        os.replace(tmp_dir, artifact_dir)
+        shutil.rmtree(old_dir)
+    else:
+        os.replace(tmp_dir, artifact_dir)
+    return manifest
+
+
+def read_manifest(artifact_dir):
+    """The artifact's manifest, after checking it can be loaded by this process."""
+    path = os.path.join(artifact_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No model artifact at {artifact_dir} ({MANIFEST_FILE} is missing)")
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        raise IncompatibleArtifactError(
+            f"{artifact_dir} has artifact format {manifest.get('format_version')}, expected {ARTIFACT_FORMAT_VERSION}")
+    release = '.'.join(str(manifest.get('sklearn_version', '')).split('.')[:2])
+    if release != _sklearn_release():
+        raise IncompatibleArtifactError(
+            f"{artifact_dir} was saved with scikit-learn {manifest.get('sklearn_version')}, "
+            f"this process has {_sklearn_release()}; re-save the artifact")
+    return manifest
+
+
+def load_artifact(artifact_dir, mmap=True):
+    """
+    Returns (vectorizer, model, manifest) from an artifact directory.
+
+    With mmap the model's arrays are memory-mapped read-only, so loading is near instant
+    and processes loading the same artifact share those pages through the OS page cache.
+    """
+    import joblib
+    manifest = read_manifest(artifact_dir)
+    bundle = joblib.load(os.path.join(artifact_dir, MODEL_FILE), mmap_mode='r' if mmap else None)
+    return bundle['vectorizer'], bundle['model'], manifest
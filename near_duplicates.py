@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import zlib
+from collections import defaultdict
+from itertools import combinations
+
+import numpy as np
+
+# Signatures are stored per book as <dir>/<content hash>-<parameters hash>.npz
+SIGNATURE_DIR = os.environ.get('SYLLAGENIUS_SIGNATURE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'syllagenius', 'minhash'))
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+# 32 bands of 4 rows: chapter pairs above roughly (1/32) ** (1/4) ~ 0.42 Jaccard become candidates
+BANDS = 32
+SEED = 1
+# Permutations are (a * x + b) mod 2^61 - 1, truncated to 32 bits. a * x may wrap around
+# 2^64 in uint64 arithmetic; that only adds mixing, as in the usual MinHash implementations
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+
+def shingle_hashes(text, k=SHINGLE_SIZE):
+    """Distinct 32-bit hashes of the k-word shingles of text; none for text shorter than k words."""
+    tokens = text.split()
+    if len(tokens) < k:
+        return np.zeros(0, dtype=np.uint64)
+    token_hashes = np.fromiter((zlib.crc32(token.encode('utf-8')) for token in tokens), dtype=np.uint64, count=len(tokens))
+    # Polynomial hash of each window, computed for all windows at once and kept to 32 bits
+    mask = np.uint64(0xFFFFFFFF)
+    shingles = np.zeros(len(tokens) - k + 1, dtype=np.uint64)
+    for offset in range(k):
+        shingles = ((shingles * np.uint64(1_000_003)) + token_hashes[offset:len(tokens) - k + 1 + offset]) & mask
+    return np.unique(shingles)
+
+
+def _permutations(num_perm=NUM_PERM, seed=SEED):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash(hashes, num_perm=NUM_PERM, seed=SEED, chunk_size=4096):
+    """
+    MinHash signature of a set of shingle hashes, as num_perm 32-bit values held in uint64.
+
+    Every permutation is applied to a chunk of shingles at once, so memory stays at
+    num_perm * chunk_size values however long the chapter is. An empty set gives the
+    maximum value in every position (see empty_signatures).
+    """
+    a, b = _permutations(num_perm, seed)
+    signature = np.full(num_perm, _MAX_HASH, dtype=np.uint64)
+    for start in range(0, len(hashes), chunk_size):
+        chunk = hashes[start:start + chunk_size]
+        permuted = ((a[:, None] * chunk[None, :] + b[:, None]) % _PRIME) & _MAX_HASH
+        np.minimum(signature, permuted.min(axis=1), out=signature)
+    return signature
+
+
+def empty_signatures(signatures):
+    """Boolean mask of the rows that are signatures of chapters without a single shingle."""
+    return (signatures == _MAX_HASH).all(axis=1)
+
+
+def estimated_jaccard(signature_a, signature_b):
+    return float(np.mean(signature_a == signature_b))
+
+
+def signature_params(excluded_sections=None):
+    """Everything a book's stored signatures depend on besides the book itself."""
+    if excluded_sections is None:
+        from education_data import exclude_sections as excluded_sections
+    return {'shingle_size': SHINGLE_SIZE, 'num_perm': NUM_PERM, 'seed': SEED,
+            'excluded_sections': sorted(section.lower() for section in excluded_sections)}
+
+
+def _params_key(params):
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def _stored_params(path):
+    with np.load(path) as data:
+        return json.loads(str(data['meta'])).get('params')
+
+
+def add_book(pdf_path, signature_dir=None, excluded_sections=None):
+    """
+    Hashes every chapter of pdf_path and stores the signatures under its content hash.
+
+    Books already stored with the same parameters (signature_params) are skipped, so
+    adding a book to the library only hashes that book; changing a parameter stores
+    fresh signatures rather than reusing ones of another shape or meaning.
+    """
+    from page_cache import file_digest
+    signature_dir = signature_dir or SIGNATURE_DIR
+    params = signature_params(excluded_sections)
+    path = os.path.join(signature_dir, f"{file_digest(pdf_path)}-{_params_key(params)}.npz")
+    if os.path.exists(path) and _stored_params(path) == params:
+        return path
+    from test_try import extract_chapter_text
+
+    chapters = extract_chapter_text(pdf_path, params['excluded_sections'])
+    titles = list(chapters)
+    # Signature values are 32-bit, so they are stored at half the width minhash computes them in
+    signatures = np.array([minhash(shingle_hashes(chapters[title], params['shingle_size']), params['num_perm'], params['seed'])
+                           for title in titles], dtype=np.uint32).reshape(len(titles), params['num_perm'])
+    os.makedirs(signature_dir, exist_ok=True)
+    np.savez(path, signatures=signatures, meta=np.array(json.dumps({'book': pdf_path, 'titles': titles, 'params': params})))
+    return path
+
+
+def load_signatures(signature_dir=None, excluded_sections=None):
+    """
+    Returns (chapters, signatures): (book, chapter title) per row, and the stacked signatures.
+
+    Only signatures stored with the current signature_params are loaded.
+    """
+    signature_dir = signature_dir or SIGNATURE_DIR
+    params = signature_params(excluded_sections)
+    suffix = f"-{_params_key(params)}.npz"
+    chapters, blocks = [], []
+    for name in sorted(os.listdir(signature_dir)) if os.path.isdir(signature_dir) else []:
+        if name.endswith(suffix):
+            with np.load(os.path.join(signature_dir, name)) as data:
+                meta = json.loads(str(data['meta']))
+                if meta.get('params') != params:
+                    continue
+                chapters.extend((meta['book'], title) for title in meta['titles'])
+                blocks.append(data['signatures'])
+    signatures = np.vstack(blocks) if blocks else np.zeros((0, NUM_PERM), dtype=np.uint32)
+    return chapters, signatures
+
+
+def candidate_pairs(signatures, bands=BANDS):
+    """
+    Row pairs that share at least one LSH band bucket.
+
+    Each signature is cut into bands; rows whose band values are identical land in the
+    same bucket, so only colliding rows are compared instead of all pairs. Chapters too
+    short to shingle are left out: their signatures are all identical, so every pair of
+    them would look like a 100% duplicate.
+    """
+    rows_per_band = signatures.shape[1] // bands
+    rows = np.flatnonzero(~empty_signatures(signatures))
+    pairs = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        band_values = np.ascontiguousarray(signatures[rows, band * rows_per_band:(band + 1) * rows_per_band])
+        for row, values in zip(rows.tolist(), band_values):
+            buckets[values.tobytes()].append(row)
+        for bucket in buckets.values():
+            pairs.update(combinations(bucket, 2))
+    return pairs
+
+
+def find_near_duplicates(signature_dir=None, threshold=0.5, bands=BANDS, same_book=False, excluded_sections=None):
+    """
+    Chapter pairs across the library whose estimated Jaccard similarity is at least threshold.
+
+    Returns (similarity, (book, chapter), (book, chapter)) tuples, most similar first.
+    Pairs within one book are skipped unless same_book is True.
+    """
+    chapters, signatures = load_signatures(signature_dir, excluded_sections)
+    matches = []
+    for row_a, row_b in candidate_pairs(signatures, bands):
+        if not same_book and chapters[row_a][0] == chapters[row_b][0]:
+            continue
+        similarity = estimated_jaccard(signatures[row_a], signatures[row_b])
+        if similarity >= threshold:
+            matches.append((similarity, chapters[row_a], chapters[row_b]))
+    return sorted(matches, key=lambda match: match[0], reverse=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description="Find near-duplicate chapters across the textbook library.")
+    parser.add_argument('library', help="Directory containing the textbook PDFs")
+    parser.add_argument('--threshold', type=float, default=0.5)
+    parser.add_argument('--signatures', default=SIGNATURE_DIR)
+    args = parser.parse_args()
+
+    for pdf_path in sorted(glob.glob(os.path.join(args.library, '**', '*.pdf'), recursive=True)):
+        add_book(pdf_path, args.signatures)
+    for similarity, (book_a, chapter_a), (book_b, chapter_b) in find_near_duplicates(args.signatures, args.threshold):
+        print(f"{100 * similarity:5.1f}%  {book_a}: {chapter_a}  <->  {book_b}: {chapter_b}")
@@ -0,0 +1,62 @@
+import heapq
+import re
+from collections import Counter
+
+import numpy as np
+
+# Same tokens and stop words as TfidfVectorizer(stop_words='english') in algorithms.create_bow_from_text
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+# Distinct n-grams tracked at once; memory stays around twice this many entries
+DEFAULT_CAPACITY = 200_000
+
+
+def _english_stop_words():
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    return ENGLISH_STOP_WORDS
+
+
+class FrequentNgrams:
+    """
+    Approximate n-gram counts in bounded memory (Misra-Gries heavy hitters).
+
+    Counts are exact until more than 2 * capacity distinct n-grams are held; the table is
+    then cut back to its `capacity` largest entries and the remaining counts are reduced
+    by the largest count discarded. Each count is undercounted by at most
+    total / (capacity + 1), so any n-gram that frequent is never lost.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.counts = Counter()
+        self.total = 0
+
+    def update(self, ngrams):
+        self.counts.update(ngrams)
+        self.total += len(ngrams)
+        if len(self.counts) > 2 * self.capacity:
+            self._prune()
+
+    def _prune(self):
+        values = np.fromiter(self.counts.values(), dtype=np.int64, count=len(self.counts))
+        # Largest count outside the top `capacity`; found by partial selection, not a sort
+        threshold = int(np.partition(values, len(values) - self.capacity - 1)[len(values) - self.capacity - 1])
+        self.counts = Counter({ngram: count - threshold for ngram, count in self.counts.items() if count > threshold})
+
+    def top(self, k, key=None):
+        """The k n-grams with the highest counts (or highest `key`), best first."""
+        return heapq.nlargest(k, self.counts.items(), key=key or (lambda item: item[1]))
+
+
+def page_ngrams(text, stop_words):
+    """Unigrams and bigrams of one page, tokenised like scikit-learn's default analyzer."""
+    tokens = [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in stop_words]
+    return tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+
+
+def count_ngrams(pages, capacity=DEFAULT_CAPACITY):
+    """Streams page texts through a FrequentNgrams sketch, one page in memory at a time."""
+    stop_words = _english_stop_words()
+    sketch = FrequentNgrams(capacity)
+    for page in pages:
+        sketch.update(page_ngrams(page, stop_words))
+    return sketch
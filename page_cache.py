@@ -0,0 +1,146 @@
+import hashlib
+import json
+import mmap
+import os
+
+import fitz  # PyMuPDF
+import numpy as np
+
+# Extracted page text is stored per PDF under a directory named after the PDF's content hash
+CACHE_DIR = os.environ.get('SYLLAGENIUS_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'syllagenius', 'pages'))
+ENABLED = os.environ.get('SYLLAGENIUS_PAGE_CACHE', '1') != '0'
+CACHE_FORMAT_VERSION = 1
+
+# (absolute path, size, mtime) -> content hash, so unchanged files are hashed once per process
+_digests = {}
+# (cache dir, content hash) -> CachedDocument
+_loaded = {}
+
+
+def enabled(use_cache=None):
+    """Resolves a per-call use_cache override against the module-wide setting."""
+    return ENABLED if use_cache is None else use_cache
+
+
+def file_digest(pdf_path, chunk_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file's contents."""
+    stat = os.stat(pdf_path)
+    key = (os.path.abspath(pdf_path), stat.st_size, stat.st_mtime_ns)
+    digest = _digests.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(pdf_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        _digests[key] = digest
+    return digest
+
+
+class CachedDocument:
+    """
+    Read-only view of one cached PDF.
+
+    Page text lives in a single UTF-8 blob that is memory-mapped, with an int64
+    offsets array (page_count + 1 entries) marking where each page starts.
+    """
+
+    def __init__(self, entry_dir):
+        with open(os.path.join(entry_dir, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != CACHE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported page cache version in {entry_dir}")
+        self.page_count = meta['page_count']
+        self.toc = meta['toc']
+        self.metadata = meta['metadata']
+        self.offsets = np.load(os.path.join(entry_dir, 'offsets.npy'), mmap_mode='r')
+        with open(os.path.join(entry_dir, 'pages.txt'), 'rb') as f:
+            # mmap cannot map an empty file, which is what a PDF without text produces
+            self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b''
+
+    def page_text(self, page_num):
+        return self._blob[int(self.offsets[page_num]):int(self.offsets[page_num + 1])].decode('utf-8')
+
+    def iter_pages(self, start_page=0, end_page=None):
+        if end_page is None:
+            end_page = self.page_count
+        for page_num in range(start_page, min(end_page, self.page_count)):
+            yield self.page_text(page_num)
+
+
+def _extract_pages(pdf_path):
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            yield page.get_text()
+
+
+def _write_entry(pdf_path, entry_dir, page_texts):
+    """Writes the cache files for pdf_path into entry_dir from an iterable of page texts."""
+    tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    with fitz.open(pdf_path) as doc:
+        offsets = np.zeros(len(doc) + 1, dtype=np.int64)
+        with open(os.path.join(tmp_dir, 'pages.txt'), 'wb') as f:
+            for page_num, text in enumerate(page_texts):
+                data = text.encode('utf-8')
+                f.write(data)
+                offsets[page_num + 1] = offsets[page_num] + len(data)
+        meta = {
+            'version': CACHE_FORMAT_VERSION,
+            'page_count': len(doc),
+            'toc': doc.get_toc(),
+            'metadata': doc.metadata,
+        }
+    np.save(os.path.join(tmp_dir, 'offsets.npy'), offsets)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    try:
+        os.replace(tmp_dir, entry_dir)
+    except OSError:
+        # Another process finished the same entry first; its copy is identical
+        for name in os.listdir(tmp_dir):
+            os.remove(os.path.join(tmp_dir, name))
+        os.rmdir(tmp_dir)
+
+
+def _open_entry(cache_dir, digest):
+    cached = _loaded.get((cache_dir, digest))
+    if cached is None:
+        cached = CachedDocument(os.path.join(cache_dir, digest))
+        _loaded[(cache_dir, digest)] = cached
+    return cached
+
+
+def lookup(pdf_path, cache_dir=None):
+    """Returns the CachedDocument for pdf_path if it has already been extracted, else None."""
+    cache_dir = cache_dir or CACHE_DIR
+    digest = file_digest(pdf_path)
+    if (cache_dir, digest) in _loaded or os.path.exists(os.path.join(cache_dir, digest, 'meta.json')):
+        return _open_entry(cache_dir, digest)
+    return None
+
+
+def store(pdf_path, page_texts, cache_dir=None):
+    """Stores already extracted text for every page of pdf_path and returns its CachedDocument."""
+    cache_dir = cache_dir or CACHE_DIR
+    digest = file_digest(pdf_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_entry(pdf_path, os.path.join(cache_dir, digest), page_texts)
+    return _open_entry(cache_dir, digest)
+
+
+def load(pdf_path, cache_dir=None):
+    """
+    Returns the CachedDocument for pdf_path, extracting and storing it on first use.
+
+    Entries are keyed by content hash, so a modified PDF gets a fresh entry.
+    """
+    cached = lookup(pdf_path, cache_dir)
+    if cached is None:
+        cached = store(pdf_path, _extract_pages(pdf_path), cache_dir)
+    return cached
+
+
+def get_page_texts(pdf_path, start_page=0, end_page=None, cache_dir=None):
+    """Yields cached text for each page in [start_page, end_page)."""
+    return load(pdf_path, cache_dir).iter_pages(start_page, end_page)
@@ -0,0 +1,160 @@
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+ENABLED = os.environ.get('SYLLAGENIUS_PARAPHRASE_CACHE', '1') != '0'
+CACHE_PATH = os.environ.get('SYLLAGENIUS_PARAPHRASE_CACHE_PATH', os.path.join(os.path.expanduser('~'), '.cache', 'syllagenius', 'paraphrases.sqlite3'))
+# In-memory tier size in entries, on-disk tier size in bytes of stored paraphrase text
+MEMORY_ENTRIES = 4096
+DISK_BYTES = 64 * 1024 * 1024
+# Disk hits whose last-used time is written in one transaction, so reads are not each a write
+TOUCH_BATCH = 256
+# Puts after which the stored size is re-read from the database, which other processes also write
+REFRESH_PUTS = 256
+# Seconds to wait for another process's write lock before giving up
+BUSY_TIMEOUT = 30.0
+
+
+def make_key(sentence, model, params):
+    """Builds the cache key for one sentence paraphrased by model with the given generation parameters."""
+    payload = json.dumps([sentence, model, params], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ParaphraseCache:
+    """
+    Two-tier memo of paraphrases: an LRU dict in front of a size-bounded SQLite file.
+
+    Disk entries carry a last-used timestamp; once the stored text exceeds disk_bytes the
+    least recently used entries are evicted. Timestamps of disk hits are written in
+    batches of TOUCH_BATCH, on the next put, or by flush(). Safe to share between
+    threads, and between processes using the same file.
+    """
+
+    def __init__(self, path=None, memory_entries=MEMORY_ENTRIES, disk_bytes=DISK_BYTES):
+        self.path = path or CACHE_PATH
+        self.memory_entries = memory_entries
+        self.disk_bytes = disk_bytes
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        try:
+            # Readers do not block the writer, nor the writer readers, across processes
+            self._db.execute('PRAGMA journal_mode=WAL')
+        except sqlite3.OperationalError:
+            pass  # e.g. a filesystem without shared memory; the rollback journal still works
+        self._touched = {}
+        self._puts = 0
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS paraphrases '
+            '(key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS paraphrases_last_used ON paraphrases (last_used)')
+        self._db.commit()
+        self._disk_used = self._stored_bytes()
+
+    def _stored_bytes(self):
+        return self._db.execute('SELECT COALESCE(SUM(size), 0) FROM paraphrases').fetchone()[0]
+
+    def _write_touches(self):
+        if self._touched:
+            self._db.executemany('UPDATE paraphrases SET last_used = ? WHERE key = ?',
+                                 [(used, key) for key, used in self._touched.items()])
+            self._touched.clear()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Returns the cached paraphrase for key, or None on a miss."""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return value
+            row = self._db.execute('SELECT value FROM paraphrases WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            self._touched[key] = time.time()
+            if len(self._touched) >= TOUCH_BATCH:
+                self._write_touches()
+                self._db.commit()
+            self._remember(key, row[0])
+            self.stats['disk_hits'] += 1
+            return row[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+            size = len(value.encode('utf-8'))
+            previous = self._db.execute('SELECT size FROM paraphrases WHERE key = ?', (key,)).fetchone()
+            self._db.execute('INSERT OR REPLACE INTO paraphrases VALUES (?, ?, ?, ?)', (key, value, size, time.time()))
+            self._write_touches()
+            self._disk_used += size - (previous[0] if previous else 0)
+            self._puts += 1
+            if self._puts % REFRESH_PUTS == 0:
+                self._disk_used = self._stored_bytes()
+            if self._disk_used > self.disk_bytes:
+                self._evict()
+            self._db.commit()
+
+    def flush(self):
+        """Writes the last-used times of disk hits not written yet."""
+        with self._lock:
+            if self._touched:
+                self._write_touches()
+                self._db.commit()
+
+    def _evict(self):
+        # Other processes may have evicted or added rows since this one last looked
+        self._disk_used = self._stored_bytes()
+        # Drop least recently used rows until the stored text is back under 90% of the bound
+        target = self.disk_bytes * 0.9
+        rows = self._db.execute('SELECT key, size FROM paraphrases ORDER BY last_used').fetchall()
+        for key, size in rows:
+            if self._disk_used <= target:
+                break
+            self._db.execute('DELETE FROM paraphrases WHERE key = ?', (key,))
+            self._disk_used -= size
+            self.stats['evictions'] += 1
+
+    def hit_rate(self):
+        hits = self.stats['memory_hits'] + self.stats['disk_hits']
+        total = hits + self.stats['misses']
+        return hits / total if total else 0.0
+
+    def close(self):
+        with self._lock:
+            try:
+                self._write_touches()
+                self._db.commit()
+            finally:
+                self._db.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Returns the process-wide ParaphraseCache, opening it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ParaphraseCache()
+                atexit.register(_cache.flush)
+    return _cache
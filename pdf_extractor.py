@@ -1,42 +1,230 @@
 import fitz  # PyMuPDF
 import re
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import page_cache
+import tracing
 
+# Parenthesised asides (citations, figure references) are dropped from extracted text
+PARENTHESES_PATTERN = re.compile(r'\([^)]*\)')
+# Most recently read pages a Document keeps, so a whole book is never held in memory
+PAGE_MEMO_SIZE = 32
+
+class Document:
+    """
+    Open-once session over a PDF, for passing to the functions in this module in place of a path.
+
+    The fitz handle is opened on first use and released by close() or by leaving a
+    with-block. The TOC and introduction page are computed once per session, and the
+    last PAGE_MEMO_SIZE pages read are kept. With the page cache enabled, page text
+    comes from the cache when the PDF is already in it; the entry is only built when
+    pages are read through to the end of the book, so reading a few pages never
+    extracts the whole PDF. Chapter ranges are in chapter_segmentation.
+    """
+
+    def __init__(self, pdf_path, use_cache=None):
+        self.pdf_path = pdf_path
+        self.use_cache = use_cache
+        self._handle = None
+        self._cached = None
+        self._toc = None
+        self._page_texts = OrderedDict()
+        self._intro_pages = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    @property
+    def handle(self):
+        if self._handle is None:
+            self._handle = fitz.open(self.pdf_path)
+        return self._handle
+
+    def _cache_entry(self, build=False):
+        if not page_cache.enabled(self.use_cache):
+            return None
+        # False records a lookup that missed, so the cache directory is not checked on every page
+        if self._cached is None or (build and self._cached is False):
+            cached = page_cache.load(self.pdf_path) if build else page_cache.lookup(self.pdf_path)
+            self._cached = cached if cached is not None else False
+        return self._cached or None
+
+    @property
+    def toc(self):
+        if self._toc is None:
+            cached = self._cache_entry()
+            self._toc = cached.toc if cached is not None else self.handle.get_toc()
+        return self._toc
+
+    @property
+    def page_count(self):
+        cached = self._cache_entry()
+        return cached.page_count if cached is not None else len(self.handle)
+
+    def page_text(self, page_num):
+        text = self._page_texts.get(page_num)
+        if text is not None:
+            self._page_texts.move_to_end(page_num)
+        else:
+            cached = self._cache_entry()
+            if cached is not None:
+                text = cached.page_text(page_num)
+                tracing.count('pages_cached')
+            else:
+                text = self.handle.load_page(page_num).get_text()
+                tracing.count('pages_extracted')
+            self._page_texts[page_num] = text
+            if len(self._page_texts) > PAGE_MEMO_SIZE:
+                self._page_texts.popitem(last=False)
+        return text
+
+    def iter_pages(self, start_page=0, end_page=None):
+        page_count = self.page_count
+        if end_page is None:
+            end_page = page_count
+        if end_page >= page_count:
+            # Reading on to the last page covers most of the book: extract all of it into
+            # the cache once so that later runs skip extraction
+            self._cache_entry(build=True)
+        for page_num in range(start_page, min(end_page, page_count)):
+            yield self.page_text(page_num)
+
+    def introduction_page(self, titles=("summary", "1", "chapter 1")):
+        key = tuple(titles)
+        if key not in self._intro_pages:
+            glossary_index_page_num = None
+            for item in self.toc:
+                title = item[1].lower()
+                if any(title_word in title for title_word in titles):
+                    # Try to match the glossary/index based on title; adjust if necessary
+                    glossary_index_page_num = item[2] - 1  # Considering PyMuPDF page index starts at 0
+                    break
+
+            if glossary_index_page_num is not None:
+                # Extra check to ensure the page number is within the document's range
+                glossary_index_page_num = min(glossary_index_page_num, self.page_count - 1)
+            self._intro_pages[key] = glossary_index_page_num
+        return self._intro_pages[key]
+
+@contextmanager
+def document_session(source, use_cache=None):
+    """
+    Yields a Document for source, which may be a path or an already open Document.
+
+    Sessions passed in are left open for the caller; sessions opened here are closed on exit.
+    """
+    if isinstance(source, Document):
+        yield source
+    else:
+        with Document(source, use_cache) as doc:
+            yield doc
+
+def _source_path(source):
+    return source.pdf_path if isinstance(source, Document) else source
+
+def get_toc_and_page_count(pdf_path, use_cache=None):
+    """Returns (toc, page_count), served from the page cache when the PDF is already cached."""
+    with document_session(pdf_path, use_cache) as doc:
+        return doc.toc, doc.page_count
+
+@tracing.traced('pdf_extractor.find_introduction_page')
 def find_introduction_page(pdf_path, titles=["summary", "1", "chapter 1"]):
-    doc = fitz.open(pdf_path)
-    toc = doc.get_toc()
-    glossary_index_page_num = None
-
-    for item in toc:
-        title = item[1].lower()
-        if any(title_word in title for title_word in titles):
-            # Try to match the glossary/index based on title; adjust if necessary
-            glossary_index_page_num = item[2] - 1  # Considering PyMuPDF page index starts at 0
-            break
-    
-    if glossary_index_page_num is not None:
-        # Extra check to ensure the page number is within the document's range
-        glossary_index_page_num = min(glossary_index_page_num, len(doc) - 1)
-    
-    return glossary_index_page_num
+    with document_session(pdf_path) as doc:
+        return doc.introduction_page(titles)
+
+def iter_page_text(pdf_path, start_page=0, end_page=None, use_cache=None):
+    """
+    Yields the raw text of each page in [start_page, end_page), one page at a time.
+
+    pdf_path may also be a Document session. Pages come from the on-disk page cache
+    unless it is disabled (use_cache=False or SYLLAGENIUS_PAGE_CACHE=0), in which case
+    the PDF is read directly; a document opened here is closed once the generator is
+    exhausted or discarded.
+    """
+    with document_session(pdf_path, use_cache) as doc:
+        yield from doc.iter_pages(start_page, end_page)
+
+def iter_content_pages(pdf_path):
+    """Yields the text of every page that mentions '1', as used for content comparison."""
+    for page_text in iter_page_text(pdf_path):
+        if '1' in page_text:
+            yield page_text
 
 def extract_text_from_content(pdf_path):
-    #######################################################
-    doc = fitz.open(pdf_path)
-    text = []
-    for page in doc:
-        if '1' in page.get_text():
-            text.append(page.get_text())
-    return "\n".join(text)
+    return "\n".join(iter_content_pages(pdf_path))
+
+def iter_text_from_introduction_onwards(pdf_path, start_page):
+    """Yields the text of each page from start_page onwards with parenthesised asides removed."""
+    for page_text in iter_page_text(pdf_path, start_page):
+        yield PARENTHESES_PATTERN.sub('', page_text)
 
 def extract_text_from_introduction_onwards(pdf_path, start_page):
-    doc = fitz.open(pdf_path)
-    text = ""
+    return "".join(iter_text_from_introduction_onwards(pdf_path, start_page))
+
+def _extract_page_range(pdf_path, start_page, end_page):
+    # Runs in a worker process, which opens its own handle: fitz documents cannot be shared
+    return list(iter_page_text(pdf_path, start_page, end_page, use_cache=False))
+
+@tracing.traced('pdf_extractor.extract_pages_parallel')
+def extract_pages_parallel(pdf_path, start_page=0, end_page=None, workers=None, chunk_pages=16):
+    """
+    Extracts raw page text for [start_page, end_page) with a pool of worker processes.
+
+    The range is split into chunks of chunk_pages pages, and the returned list holds
+    one string per page in page order. workers defaults to the number of CPUs.
+    """
+    with document_session(pdf_path) as doc:
+        page_count = doc.page_count
+    pdf_path = _source_path(pdf_path)
+    end_page = page_count if end_page is None else min(end_page, page_count)
+    starts = list(range(start_page, end_page, chunk_pages))
+    ends = [min(start + chunk_pages, end_page) for start in starts]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = executor.map(_extract_page_range, [pdf_path] * len(starts), starts, ends)
+        return [text for chunk in chunks for text in chunk]
 
-    for page_num in range(start_page, len(doc)):
-        page = doc.load_page(page_num)
-        text += page.get_text()
-        cleaned_text = re.sub(r'\([^)]*\)', '', text)
-    return cleaned_text
+def text_from_introduction_onwards_parallel(pdf_path, start_page, workers=None, chunk_pages=16):
+    """
+    Page-parallel variant of iter_text_from_introduction_onwards, returning the pages as a list.
+
+    With the page cache enabled, a cached PDF is read straight from the cache; otherwise
+    the whole book is extracted in parallel and stored so later runs skip extraction.
+    """
+    if page_cache.enabled():
+        cached = page_cache.lookup(_source_path(pdf_path))
+        if cached is None:
+            cached = page_cache.store(_source_path(pdf_path), extract_pages_parallel(pdf_path, workers=workers, chunk_pages=chunk_pages))
+        pages = cached.iter_pages(start_page)
+    else:
+        pages = extract_pages_parallel(pdf_path, start_page, workers=workers, chunk_pages=chunk_pages)
+    return [PARENTHESES_PATTERN.sub('', text) for text in pages]
+
+def extract_text_from_introduction_onwards_parallel(pdf_path, start_page, workers=None, chunk_pages=16):
+    """Page-parallel variant of extract_text_from_introduction_onwards with identical output."""
+    return "".join(text_from_introduction_onwards_parallel(pdf_path, start_page, workers, chunk_pages))
+
+def _extract_document(pdf_path):
+    return extract_text_from_introduction_onwards(pdf_path, find_introduction_page(pdf_path))
+
+@tracing.traced('pdf_extractor.extract_documents_parallel')
+def extract_documents_parallel(pdf_paths, workers=None, load=None):
+    """
+    Extracts several documents from their introduction onwards, one worker process per document.
+
+    load, a picklable function of a path, replaces the plain extraction, e.g. to preprocess
+    in the worker as well. Returns the results in the same order as pdf_paths.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(load or _extract_document, pdf_paths))
 
 def extract_chapters(pdf_path):
     """
@@ -48,11 +236,8 @@ def extract_chapters(pdf_path):
     Returns:
     A list of chapters with their titles and starting page numbers.
     """
-    # Open the PDF file
-    doc = fitz.open(pdf_path)
-
     # Retrieve the table of contents
-    toc = doc.get_toc()
+    toc, _ = get_toc_and_page_count(pdf_path)
 
     # Initialize a list to hold chapter details
     chapters = []
@@ -63,7 +248,4 @@ def extract_chapters(pdf_path):
         # Assuming you want all levels; adjust if you only want top-level chapters
         chapters.append({'title': title, 'page': page_number})
 
-    # Close the document
-    doc.close()
-
     return chapters
\ No newline at end of file
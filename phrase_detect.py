@@ -1,5 +1,6 @@
 from sklearn.feature_extraction.text import CountVectorizer
 import re
+from phrase_masking import PhraseMasker
 
 def clean_text(text):
     """ Lower text and remove punctuation for initial cleaning """
@@ -24,22 +25,23 @@ cleaned_documents = [clean_text(doc) for doc in documents]
 vectorizer = CountVectorizer(ngram_range=(1, 2))
 X = vectorizer.fit_transform(cleaned_documents)
 feature_names = vectorizer.get_feature_names_out()
-frequencies = X.toarray().sum(axis=0)
+frequencies = X.sum(axis=0).A1
 bi_gram_frequencies = dict(zip(feature_names, frequencies))
 
 # Find and print the most frequent bi-gram
 most_frequent_bi_gram = max(bi_gram_frequencies, key=bi_gram_frequencies.get)
 print("Most Frequent Bi-gram:", most_frequent_bi_gram, bi_gram_frequencies[most_frequent_bi_gram])
 
-# Filter documents to remove the specific bi-gram "data mining"
-pattern = r'\bdata mining\b'
-filtered_documents = [' '.join(re.sub(pattern, '', doc).split()) for doc in cleaned_documents]
+# Filter documents to remove the specific bi-gram "data mining"; any number of phrases
+# could be masked in the same single pass
+masker = PhraseMasker(['data mining'], replacement='')
+filtered_documents = [' '.join(masker.mask(doc).split()) for doc in cleaned_documents]
 
 # Re-run CountVectorizer on the filtered documents
 vectorizer_filtered = CountVectorizer(ngram_range=(1, 2))
 X_filtered = vectorizer_filtered.fit_transform(filtered_documents)
 new_feature_names = vectorizer_filtered.get_feature_names_out()
-new_frequencies = X_filtered.toarray().sum(axis=0)
+new_frequencies = X_filtered.sum(axis=0).A1
 new_bi_gram_frequencies = dict(zip(new_feature_names, new_frequencies))
 
 # Print all bi-grams and unigrams sorted by frequency after filtering
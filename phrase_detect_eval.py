@@ -1,47 +1,71 @@
-
 import pandas as pd
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn import svm
-import phrase_detect
 import pickle
 
+# Rows read, cleaned, transformed and predicted at a time
+CHUNK_SIZE = 50_000
+
+
+def clean_messages(messages):
+    """
+    Cleans a column of messages with vectorised string operations.
+
+    Non-ASCII characters are dropped, text is lower-cased, punctuation removed as in
+    phrase_detect.clean_text, and digits stripped.
+    """
+    messages = messages.astype(str)
+    messages = messages.str.replace(r'[^\x00-\x7F]+', '', regex=True)
+    messages = messages.str.lower().str.replace(r'[^\w\s]', '', regex=True)
+    return messages.str.replace(r'\d+', '', regex=True)
+
+
+def classify_chunks(chunks, vectorizer, model):
+    """Adds 'cleaned' and 'output' columns to each DataFrame chunk with one transform and one predict per chunk."""
+    for chunk in chunks:
+        chunk['cleaned'] = clean_messages(chunk['message'])
+        # Kept sparse: the model scores the whole chunk's CSR matrix in a single call
+        chunk['output'] = model.predict(vectorizer.transform(chunk['cleaned']))
+        yield chunk
+
+
+def evaluate(input_path, output_path, vectorizer, model, chunk_size=CHUNK_SIZE):
+    """
+    Classifies every message in input_path and writes the rows to output_path as it goes.
+
+    Only one chunk is held in memory at a time, so files with millions of rows can be
+    evaluated. Returns the number of rows written.
+    """
+    rows = 0
+    chunks = pd.read_csv(input_path, chunksize=chunk_size)
+    for chunk in classify_chunks(chunks, vectorizer, model):
+        chunk.to_csv(output_path, sep=',', mode='w' if rows == 0 else 'a', header=rows == 0)
+        rows += len(chunk)
+    return rows
+
+
+if __name__ == "__main__":
+    import os
+    from model_artifact import load_artifact, save_artifact
+
+    artifact_dir = 'final_model'
+    if os.path.isdir(artifact_dir):
+        # The saved artifact already holds the fitted vectorizer, so nothing is retrained
+        vectorizer, loaded_model, _ = load_artifact(artifact_dir)
+    else:
+        # phrase_detect runs its demo on import, so it is only imported when the artifact is built
+        import phrase_detect
 
-X_train,x,y,test_data_features,Y_test=phrase_detect.dataBuilder()
-filename='final_model.sav'
-print("Model loaded!!")
-#Loading pickle file
-loaded_model=pickle.load(open(filename, 'rb'))
-print("Evaluating!!")
-#Evaluating unlabelled data
-eval1=pd.read_csv("eval_data.csv")
-eval1=eval1.dropna(axis=1, how='all')
-eval1_len=eval1.size
-#Convert column to string and do utf-8 encoding 
-eval1['message'] = eval1['message'].astype(str)
-eval1.message.replace({r'[^\x00-\x7F]+':''}, regex=True, inplace=True)
-
-clean_msg2=[]
-#Call to msg_preprocessing method in Haptik.py for data cleaning
-for i in range(0,eval1_len):
-    clean_msg2.append(phrase_detect.msg_processing(eval1['message'][i]))
-eval1['cleaned']=clean_msg2
-eval1['cleaned'] = eval1['cleaned'].str.replace('\d+', '')
-
-classification=[]
-vectorizer=CountVectorizer(analyzer = "word",tokenizer = None,preprocessor = None,stop_words = None,max_features = 5000)
-vectorizer.fit_transform(X_train)
-i=0
-
-for i in range(0,eval1_len):
-    
-    Y=eval1['cleaned'][i:i+1]
-    validation_data=vectorizer.transform(Y)
-    validation_data=validation_data.toarray()
-    classification.append(loaded_model.predict(validation_data))
-eval1["output"]=classification
-
-#print eval1["output"]
-#Writing output to out.csv file
-print("Writing to final_output.csv")
-eval1.to_csv('final_output.csv', sep=',')
-print("Completed!!")
\ No newline at end of file
+        X_train,x,y,test_data_features,Y_test=phrase_detect.dataBuilder()
+        filename='final_model.sav'
+        #Loading pickle file
+        loaded_model=pickle.load(open(filename, 'rb'))
+        vectorizer=CountVectorizer(analyzer = "word",tokenizer = None,preprocessor = None,stop_words = None,max_features = 5000)
+        vectorizer.fit(X_train)
+        save_artifact(artifact_dir, vectorizer, loaded_model, {'source': filename})
+    print("Model loaded!!")
+    print("Evaluating!!")
+    #Evaluating unlabelled data, writing output to final_output.csv chunk by chunk
+    rows = evaluate("eval_data.csv", 'final_output.csv', vectorizer, loaded_model)
+    print(f"Wrote {rows} rows to final_output.csv")
+    print("Completed!!")
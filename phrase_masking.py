@@ -0,0 +1,104 @@
+import re
+from collections import Counter, deque
+
+# Phrases and text are matched word by word, ignoring case and whatever separates the words
+WORD_PATTERN = re.compile(r'\w+')
+
+
+class PhraseMasker:
+    """
+    Removes or replaces many phrases in one linear scan of each text.
+
+    All phrases are compiled into a single word-level Aho-Corasick automaton, so the cost
+    of masking depends on the length of the text, not on the number of phrases. Phrases
+    only match whole words, case-insensitively, with any punctuation or line breaks
+    between the words, which suits running headers and publisher lines in extracted PDF
+    text. Where matches overlap the leftmost, then longest, wins.
+
+    phrases is an iterable of strings, all replaced by `replacement`, or a dict mapping
+    each phrase to its own replacement. counts holds the matches per phrase over every
+    text masked so far.
+    """
+
+    def __init__(self, phrases, replacement=' '):
+        if not isinstance(phrases, dict):
+            phrases = dict.fromkeys(phrases, replacement)
+        self.phrases = []  # (phrase, replacement, word count) per output id
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for phrase, phrase_replacement in phrases.items():
+            words = WORD_PATTERN.findall(phrase.lower())
+            if words:
+                self._add(words, len(self.phrases))
+                self.phrases.append((phrase, phrase_replacement, len(words)))
+        self._link()
+        self.counts = Counter()
+
+    def _add(self, words, phrase_id):
+        state = 0
+        for word in words:
+            following = self._goto[state].get(word)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][word] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = following
+        self._output[state].append(phrase_id)
+
+    def _link(self):
+        # Breadth-first, so every failure target is finished before the states that use it
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, following in self._goto[state].items():
+                queue.append(following)
+                fail = self._fail[state]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(word, 0)
+                self._fail[following] = target if target != following else 0
+                self._output[following] = self._output[following] + self._output[self._fail[following]]
+
+    def matches(self, text):
+        """Yields (start, end, phrase id) for the non-overlapping matches in text, in order."""
+        goto, fail, output = self._goto, self._fail, self._output
+        spans = []  # (start, end) character span of every word seen
+        found = []
+        state = 0
+        for index, word in enumerate(WORD_PATTERN.finditer(text)):
+            spans.append(word.span())
+            token = word.group().lower()
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for phrase_id in output[state]:
+                found.append((index - self.phrases[phrase_id][2] + 1, index, phrase_id))
+        # Leftmost-longest selection of the candidate matches
+        found.sort(key=lambda match: (match[0], match[0] - match[1]))
+        last_word = -1
+        for first_word, last, phrase_id in found:
+            if first_word > last_word:
+                last_word = last
+                yield spans[first_word][0], spans[last][1], phrase_id
+
+    def mask(self, text):
+        pieces = []
+        position = 0
+        for start, end, phrase_id in self.matches(text):
+            phrase, replacement, _ = self.phrases[phrase_id]
+            pieces.append(text[position:start])
+            pieces.append(replacement)
+            position = end
+            self.counts[phrase] += 1
+        if not pieces:
+            return text
+        pieces.append(text[position:])
+        return "".join(pieces)
+
+    def mask_pages(self, pages):
+        """Masks an iterable of page texts lazily, one page at a time."""
+        for page in pages:
+            yield self.mask(page)
@@ -1,14 +1,14 @@
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.probability import FreqDist
+import tracing
+from text_preprocessor import get_preprocessor
 
-nltk.download('punkt')
-nltk.download('stopwords')
-
-def preprocess_text(text):
+def preprocess_text(text, phrases=None):
     ###########################################################
-    stop_words = set(stopwords.words('english'))
-    word_tokens = word_tokenize(text.lower())
-    filtered_text = [w for w in word_tokens if not w in stop_words and w.isalnum()]
-    return " ".join(filtered_text)
\ No newline at end of file
+    # Lower-cased word_tokenize tokens that are alphanumeric and not stopwords. NLTK takes
+    # seconds to import, so it is only loaded once text is actually processed.
+    # phrases (word tuples, see collocations.detect_phrases) become single tokens like "data_mining"
+    return get_preprocessor('preprocessing', phrases)(text)
+
+@tracing.traced('preprocessing.preprocess_pages')
+def preprocess_pages(pages, phrases=None):
+    """Preprocesses an iterable of page texts one page at a time and joins the results."""
+    return get_preprocessor('preprocessing', phrases).process_pages(pages)
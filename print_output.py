@@ -1,43 +1,270 @@
-import fitz
+import os
 import random
-import numpy as np
-from transformers import pipeline
-from sklearn.feature_extraction.text import TfidfVectorizer
+import threading
+import paraphrase_cache
+import resources
+import tracing
+from pdf_extractor import document_session
 
-# Initialize the BART pipeline
-paraphraser = pipeline("text2text-generation", model="stanford-oval/paraphraser-bart-large")
+PARAPHRASE_MODEL = "stanford-oval/paraphraser-bart-large"
 
-# Paraphrase each sentence
-def paraphrase_description(description):
-    sentences = description.split('.')
-    paraphrased_sentences = []
-    for sentence in sentences:
-        if sentence.strip():  # check if the sentence is not just spaces
-            paraphrase = paraphraser(sentence.strip() + '.', max_length=60)
-            paraphrased_sentences.append(paraphrase[0]['generated_text'])
-    return " ".join(paraphrased_sentences)
+# Inference backend: 'fp32' is the stock pipeline, 'int8' applies dynamic int8 quantisation
+# to the model's linear layers, and 'onnx' runs an ONNX Runtime export of the model, which
+# needs optimum[onnxruntime] installed locally
+PARAPHRASE_BACKENDS = ('fp32', 'int8', 'onnx')
+PARAPHRASE_BACKEND = os.environ.get('SYLLAGENIUS_PARAPHRASE_BACKEND', 'fp32')
+ONNX_EXPORT_DIR = os.environ.get('SYLLAGENIUS_ONNX_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'syllagenius', 'onnx'))
 
-def print_chapters(pdf_path, book_num):
-    ########################################################
-    doc = fitz.open(pdf_path)
+# Pipelines are built on first use, one per backend, so importing this module stays cheap
+_paraphrasers = {}
+_paraphraser_lock = threading.Lock()
 
-    # Retrieve the table of contents (TOC)
-    toc = doc.get_toc(simple=True)  # simple=True provides (level, title, page)
+def _load_paraphraser(backend):
+    if resources.OFFLINE:
+        # Read by huggingface_hub when transformers is first imported
+        os.environ.setdefault('HF_HUB_OFFLINE', '1')
+    from transformers import pipeline
+    if backend == 'fp32':
+        return pipeline("text2text-generation", model=PARAPHRASE_MODEL)
+    if backend == 'int8':
+        import torch
+        paraphraser = pipeline("text2text-generation", model=PARAPHRASE_MODEL, device=-1)
+        paraphraser.model = torch.ao.quantization.quantize_dynamic(paraphraser.model, {torch.nn.Linear}, dtype=torch.qint8)
+        return paraphraser
+    if backend == 'onnx':
+        try:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        except ImportError as e:
+            raise ImportError("The 'onnx' paraphrase backend needs optimum[onnxruntime] installed") from e
+        from transformers import AutoTokenizer
+        export_dir = os.path.join(ONNX_EXPORT_DIR, PARAPHRASE_MODEL.replace('/', '--'))
+        if os.path.isdir(export_dir):
+            model = ORTModelForSeq2SeqLM.from_pretrained(export_dir)
+        else:
+            # Export once and keep the graph so later processes load it directly
+            model = ORTModelForSeq2SeqLM.from_pretrained(PARAPHRASE_MODEL, export=True)
+            model.save_pretrained(export_dir)
+        return pipeline("text2text-generation", model=model, tokenizer=AutoTokenizer.from_pretrained(PARAPHRASE_MODEL))
+    raise ValueError(f"Unknown paraphrase backend {backend!r}; expected one of {PARAPHRASE_BACKENDS}")
 
-    if not toc:
-        print("No Table of Contents found.")
+def get_paraphraser(backend=None):
+    """Returns the shared paraphrasing pipeline for backend, loading it on the first call."""
+    backend = backend or PARAPHRASE_BACKEND
+    if backend not in _paraphrasers:
+        with _paraphraser_lock:
+            if backend not in _paraphrasers:
+                with tracing.span('print_output.load_paraphraser'):
+                    _paraphrasers[backend] = _load_paraphraser(backend)
+    return _paraphrasers[backend]
+
+def set_paraphraser(paraphraser, backend=None):
+    """
+    Installs paraphraser as the pipeline for backend, e.g. a stub in tests or a local service.
+
+    It is called like a transformers pipeline: paraphraser(sentences, max_length=..., batch_size=...)
+    returning [{'generated_text': ...}] in order.
+    """
+    with _paraphraser_lock:
+        _paraphrasers[backend or PARAPHRASE_BACKEND] = paraphraser
+
+def __getattr__(name):
+    # print_output.paraphraser used to be a module-level pipeline; keep it reachable lazily
+    if name == 'paraphraser':
+        return get_paraphraser()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Sentences sent through the paraphraser per forward pass. The default of 1 gives exactly the
+# output of sentence-at-a-time calls; larger batches are faster, but padded generation is not
+# guaranteed to produce identical text, so batching is opt-in
+PARAPHRASE_BATCH_SIZE = int(os.environ.get('SYLLAGENIUS_PARAPHRASE_BATCH_SIZE', '1'))
+
+def split_sentences(description):
+    """Splits a description on '.' into the sentences the paraphraser is given."""
+    return [sentence.strip() + '.' for sentence in description.split('.') if sentence.strip()]
+
+def _generate_local(sentences, batch_size, max_length, backend):
+    """Runs the paraphraser over sentences in length-sorted batches, returning outputs in input order."""
+    if not sentences:
+        return []
+    paraphraser = get_paraphraser(backend)
+    order = sorted(range(len(sentences)), key=lambda idx: len(sentences[idx]))
+    paraphrased = [None] * len(sentences)
+    for start in range(0, len(order), batch_size):
+        batch_indices = order[start:start + batch_size]
+        with tracing.span('print_output.generate_batch', sentences=len(batch_indices)):
+            outputs = paraphraser([sentences[idx] for idx in batch_indices], max_length=max_length, batch_size=len(batch_indices))
+        for idx, output in zip(batch_indices, outputs):
+            paraphrased[idx] = output['generated_text']
+    return paraphrased
+
+# With SYLLAGENIUS_PARAPHRASE_WORKERS=N (N > 1) the batch runner and the service start a pool:
+# the model is loaded once and N forked workers share its weights copy-on-write
+PARAPHRASE_WORKERS = int(os.environ.get('SYLLAGENIUS_PARAPHRASE_WORKERS', '0'))
+_pools = {}
+_in_pool_worker = False
+
+def _init_pool_worker(threads):
+    global _in_pool_worker
+    _in_pool_worker = True
+    try:
+        import torch
+    except ImportError:
         return
+    # Split the host's cores between workers instead of every worker using all of them
+    torch.set_num_threads(threads)
+
+def _generate_chunk(args):
+    return _generate_local(*args)
+
+class ParaphrasePool:
+    """
+    Forked worker processes that share one loaded paraphrase model.
+
+    The model is loaded in this process before the workers are forked, so its weights
+    are shared copy-on-write rather than loaded once per worker. Each worker gets
+    threads_per_worker intra-op threads (default: cores divided by workers).
+    Start pools before running any inference in this process: intra-op thread pools
+    that are already running do not survive a fork. Once started, every paraphrase
+    call in this process goes through the pool, however few sentences it has.
+    """
+
+    def __init__(self, workers, backend=None, threads_per_worker=None):
+        import multiprocessing
+        self.backend = backend or PARAPHRASE_BACKEND
+        self.workers = workers
+        get_paraphraser(self.backend)
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        self._pool = multiprocessing.get_context('fork').Pool(workers, initializer=_init_pool_worker, initargs=(threads,))
+
+    def generate(self, sentences, batch_size, max_length):
+        # Length-sorted batches are handed out one per task, so workers pad as little as a single process would.
+        # Small calls are split further so that every worker gets a share
+        order = sorted(range(len(sentences)), key=lambda idx: len(sentences[idx]))
+        batch_size = max(1, min(batch_size, -(-len(sentences) // self.workers)))
+        batches = [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+        tasks = [([sentences[idx] for idx in batch], batch_size, max_length, self.backend) for batch in batches]
+        paraphrased = [None] * len(sentences)
+        for batch, outputs in zip(batches, self._pool.imap(_generate_chunk, tasks)):
+            for idx, output in zip(batch, outputs):
+                paraphrased[idx] = output
+        return paraphrased
+
+    def close(self):
+        self._pool.terminate()
+        self._pool.join()
+
+def start_paraphrase_pool(workers=None, backend=None, threads_per_worker=None):
+    """
+    Starts (or returns) the worker pool used by paraphrase_sentences for backend.
+
+    Call it before any paraphrasing in this process and before starting threads or other pools.
+    """
+    backend = backend or PARAPHRASE_BACKEND
+    with _paraphraser_lock:
+        pool = _pools.get(backend)
+    if pool is None:
+        pool = ParaphrasePool(workers or PARAPHRASE_WORKERS or os.cpu_count() or 1, backend, threads_per_worker)
+        with _paraphraser_lock:
+            _pools[backend] = pool
+    return pool
+
+def stop_paraphrase_pools():
+    with _paraphraser_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+def _generate(sentences, batch_size, max_length, backend):
+    # Pools are only ever started explicitly: forking lazily here could follow inference
+    pool = None if _in_pool_worker else _pools.get(backend)
+    if pool is not None:
+        return pool.generate(sentences, batch_size, max_length)
+    return _generate_local(sentences, batch_size, max_length, backend)
+
+@tracing.traced('print_output.paraphrase_sentences')
+def paraphrase_sentences(sentences, batch_size=None, max_length=60, use_cache=None, backend=None):
+    """
+    Paraphrases sentences in batches and returns the paraphrases in input order.
+
+    Sentences are grouped by length before batching so each batch pads as little as
+    possible; decoding settings are the same as for single-sentence calls. With the
+    default batch_size of 1 (PARAPHRASE_BATCH_SIZE) the output is exactly that of
+    sentence-at-a-time calls; with larger batches padding may change it slightly.
+    Results are memoised in paraphrase_cache, keyed by sentence, model, backend, batch
+    size and generation parameters, so only sentences never seen before reach the model.
+    """
+    if not sentences:
+        return []
+    batch_size = batch_size or PARAPHRASE_BATCH_SIZE
+    backend = backend or PARAPHRASE_BACKEND
+    tracing.count('sentences', len(sentences))
+    if not (paraphrase_cache.ENABLED if use_cache is None else use_cache):
+        return _generate(sentences, batch_size, max_length, backend)
+
+    cache = paraphrase_cache.get_cache()
+    params = {'max_length': max_length, 'backend': backend, 'batch_size': batch_size}
+    paraphrased = {}
+    for sentence in set(sentences):
+        cached = cache.get(paraphrase_cache.make_key(sentence, PARAPHRASE_MODEL, params))
+        if cached is not None:
+            paraphrased[sentence] = cached
+    missing = [sentence for sentence in dict.fromkeys(sentences) if sentence not in paraphrased]
+    tracing.count('cache_hits', len(paraphrased))
+    if not missing:
+        # A fully cached call never loads the model
+        return [paraphrased[sentence] for sentence in sentences]
+    for sentence, paraphrase in zip(missing, _generate(missing, batch_size, max_length, backend)):
+        cache.put(paraphrase_cache.make_key(sentence, PARAPHRASE_MODEL, params), paraphrase)
+        paraphrased[sentence] = paraphrase
+    return [paraphrased[sentence] for sentence in sentences]
+
+def paraphrase_descriptions(descriptions, batch_size=None):
+    """Paraphrases many descriptions together, batching sentences across descriptions."""
+    split = [split_sentences(description) for description in descriptions]
+    paraphrased = iter(paraphrase_sentences([sentence for sentences in split for sentence in sentences], batch_size))
+    return [" ".join(next(paraphrased) for _ in sentences) for sentences in split]
+
+# Paraphrase each sentence
+def paraphrase_description(description, batch_size=None):
+    return paraphrase_descriptions([description], batch_size)[0]
+
+@tracing.traced('print_output.list_chapters')
+def list_chapters(pdf_path):
+    """
+    Returns (title, page) for every top-level TOC entry that is not an excluded section.
+
+    pdf_path may be a path or an open pdf_extractor.Document session.
+    """
+    with document_session(pdf_path) as doc:
+        # Retrieve the table of contents (TOC) as (level, title, page) entries
+        toc = doc.toc
 
     # Define a set of sections to exclude
     exclude_sections = {'title', 'contents','section', 'introduction', 'preface', 'glossary', 'index', 'appendix'}
 
+    chapters = []
     for entry in toc:
         level, title, page = entry
         # Normalize the title to lowercase to make the check case-insensitive
         if not any(excluded.lower() in title.lower() for excluded in exclude_sections) and level == 1:
-            indent = '  ' * (level - 1)  # Indent chapters based on their level
-            print(f"{book_num} - {indent}{title} - starts on page {page}")
+            chapters.append((title, page))
+    return chapters
+
+def print_chapter_list(chapters, book_num):
+    """Prints (title, page) pairs as returned by list_chapters."""
+    if not chapters:
+        print("No Table of Contents found.")
+        return
+    for title, page in chapters:
+        print(f"{book_num} - {title} - starts on page {page}")
+
+def print_chapters(pdf_path, book_num):
+    ########################################################
+    # pdf_path may be a path or an open pdf_extractor.Document session
+    print_chapter_list(list_chapters(pdf_path), book_num)
 
+@tracing.traced('print_output.generate_description')
 def generate_description(templates, word_dict, user_title):
     description = []
     for template in templates:
@@ -0,0 +1,47 @@
+import os
+import threading
+
+# With SYLLAGENIUS_OFFLINE=1 nothing is downloaded: missing NLTK data raises LookupError
+# and Hugging Face models are only loaded from the local cache
+OFFLINE = os.environ.get('SYLLAGENIUS_OFFLINE', '0') == '1'
+
+# Download name -> path that nltk.data.find looks up
+NLTK_RESOURCE_PATHS = {
+    'punkt': 'tokenizers/punkt',
+    'punkt_tab': 'tokenizers/punkt_tab',
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet',
+}
+
+_lock = threading.Lock()
+_available = set()
+
+
+def set_offline(offline=True):
+    """Switches offline mode on or off for the rest of the process."""
+    global OFFLINE
+    OFFLINE = offline
+
+
+def ensure_nltk(*resources):
+    """
+    Makes sure the given NLTK resources are installed, checking each one once per process.
+
+    Missing resources are downloaded unless offline mode is on, in which case a
+    LookupError names the resource to install.
+    """
+    if _available.issuperset(resources):
+        return
+    import nltk
+    with _lock:
+        for resource in resources:
+            if resource in _available:
+                continue
+            try:
+                nltk.data.find(NLTK_RESOURCE_PATHS.get(resource, resource))
+            except LookupError:
+                if OFFLINE:
+                    raise LookupError(f"NLTK resource '{resource}' is not installed and offline mode is on")
+                if not nltk.download(resource, quiet=True):
+                    raise LookupError(f"NLTK resource '{resource}' could not be downloaded")
+            _available.add(resource)
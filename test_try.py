@@ -1,17 +1,10 @@
-import fitz  # PyMuPDF for PDF processing
-import nltk
-import re
 from sklearn.feature_extraction.text import CountVectorizer
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-from nltk.tokenize import word_tokenize, MWETokenizer
 import random
+from functools import partial
 from sklearn.feature_extraction.text import TfidfVectorizer
 import numpy as np
-
-# Download necessary NLTK resources
-nltk.download('punkt')
-nltk.download('stopwords')
+from chapter_segmentation import segment_chapters
+from text_preprocessor import get_preprocessor
 
 # Import categories and templates from a separate file (assuming they are defined there)
 from education_data import categories, learning_outcomes_templates, exclude_sections
@@ -44,85 +37,74 @@ def create_bow_from_chapters(chapter_texts):
     
     return vectorizer, X, top_features
 
-def extract_chapter_text(pdf_path, excluded_sections):
-    # Open the PDF document
-    doc = fitz.open(pdf_path)
-    toc = doc.get_toc(simple=True)
-
-    # Determine top-most level with excluded sections present
-    top_most_level = None
-    for entry in toc:
-        if any(ex.lower() in entry[1].lower() for ex in excluded_sections):
-            top_most_level = entry[0]
-            break
-
-    # If no excluded sections found at any level, start from the general top level
-    if top_most_level is None:
-        top_most_level = min(entry[0] for entry in toc)
-
-    # Filter TOC to include only entries at the determined top-most level, excluding sections
-    filtered_toc = [entry for entry in toc if entry[0] == top_most_level and not any(
-        ex.lower() in entry[1].lower() for ex in excluded_sections)]
-
-    chapter_texts = {}
-    for entry in filtered_toc:
-        level, title, page_start = entry
-        try:
-            # Find the next page start to determine the current page end
-            page_end = [e[2] for e in filtered_toc if e[2] > page_start][0] - 1
-        except IndexError:
-            # If no next page, assume end of document
-            page_end = doc.page_count - 1
+def extract_chapter_text(pdf_path, excluded_sections, workers=None, phrases=None):
+    # pdf_path may also be an open session; with workers chapters are cleaned in parallel.
+    # phrases (word tuples, see collocations.detect_phrases) are kept as single tokens
+    clean = partial(clean_text, phrases=phrases) if phrases else clean_text
+    return segment_chapters(pdf_path, excluded_sections, clean=clean, workers=workers)
 
-        # Extract text from the determined page range
-        text = ""
-        for page_num in range(page_start - 1, page_end):
-            page = doc.load_page(page_num)
-            text += page.get_text()
+def clean_text(text, phrases=None):
+    # Alphabetic word_tokenize tokens minus stopwords, lemmatised once per distinct word
+    return get_preprocessor('chapters', phrases)(text)
 
-        # Clean and store the chapter text
-        chapter_texts[title] = clean_text(text)
+def top_keywords_per_row(X, feature_names, k=5):
+    """
+    The k highest-scoring terms of every row of a CSR matrix, best first.
 
-    doc.close()
-    return chapter_texts
+    Only each row's stored (non-zero) entries are ranked, with a partial selection,
+    so rows are never densified to the width of the vocabulary. Equal scores are
+    ordered by column index, so the same matrix always gives the same keywords.
+    """
+    X = X.tocsr()
+    keywords = []
+    for row in range(X.shape[0]):
+        start, end = X.indptr[row], X.indptr[row + 1]
+        scores, columns = X.data[start:end], X.indices[start:end]
+        if len(scores) > k:
+            # Everything tied with the k-th best score is kept until the tie-break below
+            kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+            top = np.flatnonzero(scores >= kth)
+        else:
+            top = np.arange(len(scores))
+        top = top[np.lexsort((columns[top], -scores[top]))][:k]
+        keywords.append([feature_names[column] for column in columns[top]])
+    return keywords
 
-def clean_text(text):
-    text = text.lower()
-    tokens = word_tokenize(text)
-    words = [word for word in tokens if word.isalpha()]
-    stop_words = set(stopwords.words('english'))
-    words = [word for word in words if word not in stop_words]
-    lemmatizer = WordNetLemmatizer()
-    words = [lemmatizer.lemmatize(word) for word in words]
-    return ' '.join(words)
+def generate_course_outcomes(chapter_texts, vectorizer, top_k=5, rng=None):
+    """
+    Generates two or three learning outcomes per chapter from its top keywords.
 
-def generate_course_outcomes(chapter_texts, vectorizer):
+    All chapters are transformed in one sparse call. Pass a seeded random.Random as rng
+    to reproduce the outcomes; chapters without any vocabulary terms get no outcomes.
+    """
+    rng = rng or random
+    titles = list(chapter_texts)
+    bow = vectorizer.transform([chapter_texts[title] for title in titles])
+    feature_array = vectorizer.get_feature_names_out()
+    category_names = list(categories.keys())
     outcomes = []
-    for title, text in chapter_texts.items():
-        # Get BoW representation for the cleaned text
-        bow = vectorizer.transform([text])
-        feature_array = vectorizer.get_feature_names_out()
-        # Sort terms by frequency and select top keywords
-        tfidf_sorting = bow.toarray().flatten().argsort()[::-1]
-        top_keywords = [feature_array[i] for i in tfidf_sorting[:5]]
-        # Generate three random outcomes using these terms
-        ri = random.randint(2, 3)
+    for title, top_keywords in zip(titles, top_keywords_per_row(bow, feature_array, top_k)):
+        if not top_keywords:
+            continue
+        # Generate two or three random outcomes using these terms
+        ri = rng.randint(2, 3)
         for _ in range(ri):
-            template = random.choice(learning_outcomes_templates)
-            category_name = random.choice(list(categories.keys()))
-            action = random.choice(categories[category_name])
-            keyword = random.choice(top_keywords)
+            template = rng.choice(learning_outcomes_templates)
+            category_name = rng.choice(category_names)
+            action = rng.choice(categories[category_name])
+            keyword = rng.choice(top_keywords)
             outcome = template.format(action, keyword)
             outcomes.append((title, outcome))
     return outcomes
-# Path to your PDF
-pdf_path = 'Data Science Algorithms in a Week.pdf'
-# Extract texts from each chapter
-chapter_texts = extract_chapter_text(pdf_path, exclude_sections)
-# Create BoW from the chapter texts and identify top bi-grams
-vectorizer, X, top_features = create_bow_from_chapters(chapter_texts)
-# Generate course outcomes based on the BoW of each chapter
-course_outcomes = generate_course_outcomes(chapter_texts, vectorizer)
-# Print each outcome
-for index, (chapter_title, outcome) in enumerate(course_outcomes, start = 1):
-    print(f"{index} | {outcome}")
\ No newline at end of file
+if __name__ == "__main__":
+    # Path to your PDF
+    pdf_path = 'Data Science Algorithms in a Week.pdf'
+    # Extract texts from each chapter
+    chapter_texts = extract_chapter_text(pdf_path, exclude_sections)
+    # Create BoW from the chapter texts and identify top bi-grams
+    vectorizer, X, top_features = create_bow_from_chapters(chapter_texts)
+    # Generate course outcomes based on the BoW of each chapter
+    course_outcomes = generate_course_outcomes(chapter_texts, vectorizer)
+    # Print each outcome
+    for index, (chapter_title, outcome) in enumerate(course_outcomes, start = 1):
+        print(f"{index} | {outcome}")
\ No newline at end of file
@@ -0,0 +1,126 @@
+import re
+import threading
+
+import tracing
+from resources import ensure_nltk
+
+# Runs of word characters: the same tokens as lower-casing, re.sub(r'\W+', ' ', text) and split()
+WORD_PATTERN = re.compile(r'\w+')
+
+_stop_words = {}
+_lock = threading.Lock()
+
+
+def stop_words(language='english'):
+    """NLTK's stopword list for language, loaded once per process as a frozenset."""
+    words = _stop_words.get(language)
+    if words is None:
+        ensure_nltk('stopwords')
+        from nltk.corpus import stopwords
+        words = _stop_words.setdefault(language, frozenset(stopwords.words(language)))
+    return words
+
+
+class TextPreprocessor:
+    """
+    Lower-cases, tokenises, filters and optionally stems or lemmatises text.
+
+    tokenizer is 'regex' (precompiled WORD_PATTERN) or 'nltk' (word_tokenize).
+    keep is 'isalnum', 'isalpha' or None, the str method a token must pass to be kept.
+    normalize is None, 'stem' (Porter) or 'lemma' (WordNet). Stems and lemmas are cached
+    per distinct word, so each word of the vocabulary is normalised only once however
+    often it occurs. Stopwords are dropped before normalising.
+
+    phrases are word tuples (e.g. from collocations.detect_phrases on this preprocessor's
+    output) that are merged into single tokens such as "data_mining" as the last step.
+    """
+
+    def __init__(self, tokenizer='regex', keep=None, normalize=None, stop_words='english', phrases=None):
+        if tokenizer not in ('regex', 'nltk'):
+            raise ValueError(f"Unknown tokenizer {tokenizer!r}")
+        if normalize not in (None, 'stem', 'lemma'):
+            raise ValueError(f"Unknown normalize mode {normalize!r}")
+        self.tokenizer = tokenizer
+        self.keep = keep
+        self.normalize = normalize
+        self._stop_words = stop_words
+        self.phrases = frozenset(tuple(phrase) for phrase in phrases or ())
+        self._normalized = {}
+        self._ready = False
+
+    def _prepare(self):
+        # NLTK data and objects are only loaded once the first text is processed
+        with _lock:
+            if self._ready:
+                return
+            if self.tokenizer == 'nltk':
+                ensure_nltk('punkt')
+                from nltk.tokenize import word_tokenize
+                self._tokenize = word_tokenize
+            else:
+                self._tokenize = WORD_PATTERN.findall
+            if isinstance(self._stop_words, str):
+                self._stop_words = stop_words(self._stop_words)
+            self._stop_words = frozenset(self._stop_words or ())
+            if self.normalize == 'stem':
+                from nltk.stem import PorterStemmer
+                self._normalizer = PorterStemmer().stem
+            elif self.normalize == 'lemma':
+                ensure_nltk('wordnet')
+                from nltk.stem import WordNetLemmatizer
+                self._normalizer = WordNetLemmatizer().lemmatize
+            if self.phrases:
+                from collocations import phrase_tokenizer
+                self._merge_phrases = phrase_tokenizer(self.phrases).tokenize
+            self._ready = True
+
+    def _normalize_word(self, word):
+        normalized = self._normalized.get(word)
+        if normalized is None:
+            normalized = self._normalized[word] = self._normalizer(word)
+        return normalized
+
+    def tokens(self, text):
+        if not self._ready:
+            self._prepare()
+        tokens = self._tokenize(text.lower())
+        if self.keep is not None:
+            keep = getattr(str, self.keep)
+            tokens = [token for token in tokens if keep(token)]
+        stop = self._stop_words
+        tokens = [token for token in tokens if token not in stop]
+        if self.normalize is not None:
+            tokens = [self._normalize_word(token) for token in tokens]
+        if self.phrases:
+            tokens = self._merge_phrases(tokens)
+        tracing.count('tokens', len(tokens))
+        return tokens
+
+    def __call__(self, text):
+        return " ".join(self.tokens(text))
+
+    def process_pages(self, pages):
+        """Processes an iterable of page texts one page at a time and joins the non-empty results."""
+        processed = (self(page) for page in pages)
+        return " ".join(text for text in processed if text)
+
+
+# Settings that reproduce each of the original preprocessors exactly
+PRESETS = {
+    # preprocessing.preprocess_text and get_chapters.preprocess_text
+    'preprocessing': {'tokenizer': 'nltk', 'keep': 'isalnum'},
+    # compare.clean_and_tokenize
+    'compare': {'tokenizer': 'regex', 'normalize': 'stem'},
+    # test_try.clean_text
+    'chapters': {'tokenizer': 'nltk', 'keep': 'isalpha', 'normalize': 'lemma'},
+}
+_presets = {}
+
+
+def get_preprocessor(preset, phrases=None):
+    """Shared TextPreprocessor for one of PRESETS, so its word cache lives for the whole process."""
+    key = (preset, frozenset(tuple(phrase) for phrase in phrases or ()))
+    preprocessor = _presets.get(key)
+    if preprocessor is None:
+        preprocessor = _presets.setdefault(key, TextPreprocessor(**PRESETS[preset], phrases=key[1]))
+    return preprocessor
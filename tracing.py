@@ -0,0 +1,214 @@
+"""
+Per-stage tracing for course runs.
+
+Spans are opened with `with span('name'):` or the @traced decorator and nest. Inside an
+active Trace each span records wall time, CPU time, item counts (pages, tokens, features,
+sentences, ...) added with count(), and optionally peak memory. Outside a trace spans
+and counts do nothing, so instrumented code pays almost nothing by default.
+
+    with Trace(profile=True) as trace:
+        main.run_course(...)
+    trace.save('trace.json')
+
+Setting SYLLAGENIUS_TRACE=trace.json traces main.main runs and writes the trace there;
+SYLLAGENIUS_TRACE_MEMORY=1 adds peak memory (which inflates the timings) and
+SYLLAGENIUS_PROFILE=1 adds cProfile. Work done in worker processes is not traced.
+"""
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+TRACE_PATH = os.environ.get('SYLLAGENIUS_TRACE')
+MEMORY = os.environ.get('SYLLAGENIUS_TRACE_MEMORY', '0') == '1'
+PROFILE = os.environ.get('SYLLAGENIUS_PROFILE', '0') == '1'
+
+_active = None
+_local = threading.local()
+
+
+class Span:
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+        self.counts = {}
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.wall = None
+        self.cpu = None
+        # Highest traced allocation seen by this span's children
+        self.child_peak = 0
+        self.peak = 0
+        # Traced memory already in use when the span opened; peaks are reported above it
+        self.memory_start = 0
+
+    def count(self, key, n=1):
+        self.counts[key] = self.counts.get(key, 0) + n
+
+    @property
+    def peak_growth(self):
+        return max(self.peak - self.memory_start, 0)
+
+
+class Trace:
+    """
+    Collects the spans of one run.
+
+    With memory, tracemalloc measures each span's peak allocation. It slows Python code
+    noticeably, which inflates every timing, so it is off unless asked for. With
+    profile, cProfile runs for the whole trace and the most expensive functions are
+    included in the export.
+    """
+
+    def __init__(self, memory=False, profile=False):
+        self.memory = memory
+        self.profile = profile
+        self.spans = []
+        self.started = None
+        self._profiler = None
+        self._lock = threading.Lock()
+        self._started_tracemalloc = False
+
+    def __enter__(self):
+        global _active
+        if _active is not None:
+            raise RuntimeError("A trace is already active")
+        self.started = time.perf_counter()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if self.profile:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        _active = self
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active
+        _active = None
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+    def _record(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def profile_summary(self, limit=40):
+        """The functions with the highest cumulative time, as dicts."""
+        if self._profiler is None:
+            return []
+        import pstats
+        stats = pstats.Stats(self._profiler)
+        rows = []
+        for (filename, line, function), (_, calls, total, cumulative, _) in stats.stats.items():
+            rows.append({'function': f"{os.path.basename(filename)}:{line}({function})", 'calls': calls,
+                         'total_seconds': total, 'cumulative_seconds': cumulative})
+        return sorted(rows, key=lambda row: row['cumulative_seconds'], reverse=True)[:limit]
+
+    def to_dict(self):
+        ids = {id(span): idx for idx, span in enumerate(self.spans)}
+        return {
+            'spans': [{
+                'id': ids[id(span)],
+                'name': span.name,
+                'parent': ids.get(id(span.parent)) if span.parent is not None else None,
+                'start_seconds': span.start - self.started,
+                'wall_seconds': span.wall,
+                'cpu_seconds': span.cpu,
+                'peak_mb': span.peak_growth / (1 << 20) if self.memory else None,
+                'counts': span.counts,
+            } for span in self.spans],
+            'profile': self.profile_summary(),
+        }
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        if self._profiler is not None:
+            self._profiler.dump_stats(f"{os.path.splitext(path)[0]}.prof")
+
+    def summary(self):
+        """One line per span, indented by depth, for printing."""
+        depth = {}
+        lines = []
+        for span in sorted(self.spans, key=lambda span: span.start):
+            depth[id(span)] = depth.get(id(span.parent), -1) + 1 if span.parent is not None else 0
+            counts = ", ".join(f"{key}={value}" for key, value in span.counts.items())
+            memory = f" peak +{span.peak_growth / (1 << 20):.1f} MB" if self.memory else ""
+            lines.append(f"{'  ' * depth[id(span)]}{span.name}: {span.wall:.3f}s wall, {span.cpu:.3f}s cpu{memory} {counts}".rstrip())
+        return "\n".join(lines)
+
+
+class _NoSpan:
+    # Stands in for a span when no trace is active
+    def count(self, key, n=1):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+@contextmanager
+def span(name, **counts):
+    """Times the enclosed block as a child of the current span; counts are added to it."""
+    trace = _active
+    if trace is None:
+        yield _NO_SPAN
+        return
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    parent = stack[-1] if stack else None
+    current = Span(name, parent)
+    for key, n in counts.items():
+        current.count(key, n)
+    if trace.memory and tracemalloc.is_tracing():
+        # The peak counter is shared, so the parent's peak so far is kept before it is reset
+        if parent is not None:
+            parent.child_peak = max(parent.child_peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        current.memory_start = tracemalloc.get_traced_memory()[0]
+    stack.append(current)
+    try:
+        yield current
+    finally:
+        stack.pop()
+        current.wall = time.perf_counter() - current.start
+        current.cpu = time.process_time() - current.cpu_start
+        if trace.memory and tracemalloc.is_tracing():
+            current.peak = max(current.child_peak, tracemalloc.get_traced_memory()[1])
+            if parent is not None:
+                parent.child_peak = max(parent.child_peak, current.peak)
+            # The next sibling measures from here rather than inheriting this span's peak
+            tracemalloc.reset_peak()
+        trace._record(current)
+
+
+def count(key, n=1):
+    """Adds n to key on the innermost open span, if a trace is active."""
+    if _active is None:
+        return
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        stack[-1].count(key, n)
+
+
+def traced(name=None):
+    """Decorator that wraps every call of the function in a span."""
+    def decorate(function):
+        span_name = name or f"{function.__module__}.{function.__qualname__}"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return function(*args, **kwargs)
+            with span(span_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate